@@ -1,16 +1,22 @@
-import os
 import json
-import re
-import subprocess
-import sys
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import config
-from openai import OpenAI
+import metrics
+from item_tracker import ItemTracker
+from llm_client import LLMClient
+from raw_store import RawStore
+from sandbox import get_pool
+from shard_planner import ShardPlanner, shard_label
 from strategy_selector import StrategySelector
 
+_END = object()
+
 class ApiRunner:
-    def __init__(self):
-        self.client = OpenAI(api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL)
+    def __init__(self, llm=None):
+        self.llm = llm or LLMClient()
+        self.sample_data = None
+        self.store = RawStore()
+        self.on_page = None
 
     def _get_context_and_sample(self, entry):
         req = entry['request']
@@ -44,6 +50,7 @@ class ApiRunner:
 
         try:
             full_json = json.loads(text)
+            self.sample_data = full_json
             skeleton_json = prune_structure(full_json)
             sample_fragment = json.dumps(skeleton_json, ensure_ascii=False)
 
@@ -64,7 +71,7 @@ class ApiRunner:
 
     def _generate_pagination_script(self, context, sample):
         prompt = f"""
-                编写一个 Python 爬虫脚本 `generated_scraper.py`。
+                编写一个 Python 爬虫模块 `generated_scraper.py`，核心是函数 `scrape(params=None)`。
 
                 【目标】
                 1. 使用 `requests.Session()` 和 Headers: {json.dumps(context['headers'])}
@@ -78,27 +85,52 @@ class ApiRunner:
                 - 循环控制: 
                     - 每一轮请求后，解析 JSON。
                     - 不要只判断根节点。递归搜索 JSON 树，找到包含最多 Dict 的 List（这通常是商品列表）。
-                    - 停止条件: 只有当该 List 长度为 0，或者连续两页的 List 内容完全一致时才停止。最大页数 30 页。
+                    - 停止条件: 只有当该 List 长度为 0，或者连续两页的 List 内容完全一致时才停止。最大页数 {config.SCRAPER_MAX_PAGES} 页。
                     - 步长递增: 如果参数是 offset，则 `offset += pageSize`；如果是 page，则 `page += 1`。
 
                 【输出要求】
                 - 必须打印每页抓取状态: `print(f"Page {{n}} fetched: {{len(items)}} items found.")`
-                - 确保文件存至: `{config.RAW_DATA_DIR.replace('\\', '/')}/page_n.json`
+                - `scrape(params=None)`: 若传入 params (Dict)，用其覆盖初始参数中的同名项后再开始翻页 (用于分片抓取)。
+                - `scrape()` 必须是生成器: 每抓取到一页，立即 `yield` 该页完整的原始 JSON (resp.json())。
+                - 不要写任何文件，不要在模块顶层执行抓取 (可保留 `if __name__ == "__main__": scrape()`)。
                 - 只输出 Python 代码，包裹在 ```python ``` 中。
                 """
 
-        try:
-            response = self.client.chat.completions.create(
-                model=config.LLM_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1
-            )
-            code = re.search(r'```python\s*(.*?)\s*```', response.choices[0].message.content, re.DOTALL)
-            return code.group(1) if code else None
-        except:
-            return None
+        return self.llm.generate_code(prompt, require="scrape")
 
-    def run(self, entry=None):
+    def plan(self, entry):
+        """生成翻页脚本并规划分片，返回 (context, script, shards)；脚本生成失败时 script 为 None。"""
+        context, sample = self._get_context_and_sample(entry)
+        script_content = self._generate_pagination_script(context, sample)
+        if not script_content: return context, None, []
+
+        with open(config.GENERATED_SCRAPER_PATH, 'w', encoding='utf-8') as f:
+            f.write(script_content)
+        shards = []
+        if self.sample_data:
+            planner = ShardPlanner(context, self.sample_data)
+            shards = planner.plan()
+            if shards and not self._shards_narrow(script_content, planner, shards[0]): shards = []
+        return context, script_content, shards
+
+    def _shards_narrow(self, script_content, planner, shard):
+        """抓取第一个分片的首页，确认服务端确实按分片参数缩小了结果，避免各分片重复翻同一份全量数据。"""
+        stream = get_pool().stream(script_content, "scrape", shard)
+        try:
+            first = next(stream, None)
+        except Exception as e:
+            print(f"[!] [Shard] 分片首页抓取失败，无法校验分片参数，按分片继续: {e}")
+            return True
+        finally:
+            stream.close()
+        if not first or planner.narrows(first): return True
+        print(f"[!] [Shard] 分片 {shard} 首页商品总数未缩小，服务端可能忽略了分片参数，退化为单次翻页")
+        metrics.incr("shard_plans_rejected")
+        return False
+
+    def run(self, entry=None, on_page=None):
+        """on_page: 可选回调，每保存一页立即以 (该页数据, 分片标签) 调用 (供下游并行解析)。"""
+        self.on_page = on_page
         print("==================================================")
         print("[*] [ApiRunner] 启动采集流程")
 
@@ -109,24 +141,18 @@ class ApiRunner:
                 entry = res['data'] if res and res['mode'] == 'API' else None
 
         if not entry: return print("[!] 未锁定目标 API")
-        context, sample = self._get_context_and_sample(entry)
+        self.store.reset()
 
-        if os.path.exists(config.RAW_DATA_DIR):
-            for f in os.listdir(config.RAW_DATA_DIR):
-                if f.endswith('.json'): os.remove(os.path.join(config.RAW_DATA_DIR, f))
-
-        script_content = self._generate_pagination_script(context, sample)
+        context, script_content, shards = self.plan(entry)
         if script_content:
-            with open(config.GENERATED_SCRAPER_PATH, 'w', encoding='utf-8') as f:
-                f.write(script_content)
-
             try:
-                print("[*] [System] 正在执行翻页脚本，请稍后...")
-                subprocess.run([sys.executable, config.GENERATED_SCRAPER_PATH], check=True)
-
-                files = [f for f in os.listdir(config.RAW_DATA_DIR) if f.endswith('.json')]
-                if files:
-                    print(f"[√] 采集完成，共获取 {len(files)} 个分页文件。")
+                print("[*] [System] 正在沙箱中执行翻页脚本，请稍后...")
+                if shards:
+                    saved = self._run_shards(script_content, shards, context['url'])
+                else:
+                    saved = self._save_pages(get_pool().stream(script_content, "scrape"), context['url'])
+                if saved:
+                    print(f"[√] 采集完成，共获取 {saved} 个分页。")
                     return True
             except Exception as e:
                 print(f"[!] 脚本执行崩溃: {e}")
@@ -134,15 +160,77 @@ class ApiRunner:
         print("[!] 切换至单页兜底模式...")
         return self._execute_fast_request(context)
 
+    def _run_shards(self, script_content, shards, source_url):
+        """并行抓取各分片，每页到达即连同分片标签写入存储 (跨分片重复的商品由 Processor 按 SKU 合并)。返回总页数。"""
+        pool = get_pool()
+
+        def crawl(args):
+            i, shard = args
+            saved = 0
+            try:
+                saved = self._save_pages(pool.stream(script_content, "scrape", shard), source_url, shard_label(shard))
+                print(f"    -> [Shard {i + 1}/{len(shards)}] {shard} | 分页数: {saved}")
+            except Exception as e:
+                print(f"    [!] [Shard {i + 1}/{len(shards)}] {shard} 抓取失败: {e}")
+            return saved
+
+        # 留出一个沙箱 worker 给并行进行的页面解析，避免解析批次排在所有分片之后
+        with ThreadPoolExecutor(max_workers=max(1, pool.size - 1)) as executor:
+            total = sum(executor.map(crawl, enumerate(shards)))
+        metrics.incr("shards_crawled", len(shards))
+        return total
+
+    def _save_pages(self, pages, source_url=None, shard=None):
+        """逐页写入存储并通知 on_page；pages 可以是列表或流式生成器。
+
+        翻页脚本只在空页或连续两页完全相同时停止；这里按商品身份再判断一次，
+        遇到商品全部或大部分已出现过的页面 (末页重复、offset 回绕) 时提前关闭流，不再继续请求。
+        每页的到达耗时记入 page_fetch 阶段，保存的页面按存储时已算出的原始体积记入 bytes_read。
+        """
+        saved = 0
+        tracker = ItemTracker()
+        stream = iter(pages)
+        try:
+            while True:
+                with metrics.stage("page_fetch"):
+                    page = next(stream, _END)
+                if page is _END: break
+                if not page: continue
+                status = tracker.classify(page)
+                if status != "repeat":
+                    page_no = self.store.append(page, source_url, shard=shard)
+                    metrics.incr("bytes_read", self.store.index()[page_no - 1]["size"])
+                    saved += 1
+                    metrics.incr("pages_fetched")
+                    if self.on_page: self.on_page(page, shard)
+                if status in ("repeat", "overlap"):
+                    print(f"[*] 第 {saved + (status == 'repeat')} 页商品{'全部' if status == 'repeat' else '大部分'}已出现过，停止翻页")
+                    metrics.incr("pagination_early_stops")
+                    break
+        except Exception as e:
+            # 流式抓取中途失败时保留已获取的分页
+            if not saved: raise
+            print(f"[!] 翻页中断，保留已获取的 {saved} 页: {e}")
+        finally:
+            # 提前结束时终止仍在翻页的沙箱 worker
+            close = getattr(pages, 'close', None)
+            if close: close()
+        return saved
+
     def _execute_fast_request(self, context):
-        os.makedirs(config.RAW_DATA_DIR, exist_ok=True)
+        import requests
+        session = requests.Session()
+        if config.HTTP_CACHE:
+            import http_cache
+            http_cache.mount(session)
+
+        def fetch():
+            resp = session.request(method=context['method'], url=context['url'],
+                                   headers=context['headers'], params=context['params'], timeout=15)
+            if resp.status_code == 200: yield resp.json()
+
         try:
-            resp = requests.request(method=context['method'], url=context['url'],
-                                    headers=context['headers'], params=context['params'], timeout=15)
-            if resp.status_code == 200:
-                with open(os.path.join(config.RAW_DATA_DIR, "fallback_page.json"), 'w', encoding='utf-8') as f:
-                    json.dump(resp.json(), f, ensure_ascii=False)
-                return True
+            return self._save_pages(fetch(), context['url']) > 0
         except:
             return False
 
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_importtime(stderr):
+    """解析 -X importtime 输出: 按出现顺序返回 [(模块名, self_us, cumulative_us, 缩进层级)]。"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        modules.append((name.strip(), self_us, cumulative_us, depth))
+    return modules
+
+
+def measure_import_time(module, runs=3):
+    """在全新解释器中导入 module，取多次运行中的最小累计耗时，并列出耗时最多的直接依赖。"""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=REPO_DIR, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} 失败:\n{proc.stderr[-2000:]}")
+        modules = _parse_importtime(proc.stderr)
+        pos = next((i for i, m in enumerate(modules) if m[0] == module and m[3] == 0), None)
+        if pos is None:
+            continue
+        total_us = modules[pos][2]
+        if best is None or total_us < best[0]:
+            # 子模块先于父模块输出: 向前收集到上一个顶层模块为止的直接依赖
+            children = []
+            for name, _, cum, depth in reversed(modules[:pos]):
+                if depth == 0: break
+                if depth == 1: children.append((name, cum))
+            best = (total_us, children)
+
+    if best is None:
+        raise RuntimeError(f"未在 importtime 输出中找到 {module}")
+    total_us, children = best
+    top = sorted(children, key=lambda x: x[1], reverse=True)[:10]
+    return {"seconds": round(total_us / 1e6, 4), "top_imports_ms": {name: round(cum / 1000, 1) for name, cum in top}}
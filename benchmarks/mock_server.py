@@ -0,0 +1,82 @@
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.synthetic_har import make_products, nextjs_html
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        server = self.server
+
+        if parsed.path.endswith("/products"):
+            limit = int(query.get("limit", server.page_size))
+            if "offset" in query:
+                start = int(query["offset"])
+            else:
+                start = (int(query.get("page", 1)) - 1) * limit
+            items = server.catalog[start:start + limit]
+            body = json.dumps({"data": {"search": {"total": len(server.catalog), "products": items}},
+                               "meta": {"page": query.get("page"), "limit": limit}}).encode("utf-8")
+            self._reply(200, "application/json", body)
+        elif parsed.path.startswith("/c/"):
+            # SSR 分类页: 超出总量后重复最后一页，模拟常见的翻页越界行为
+            page = max(1, int(query.get("page", 1)))
+            last = max(1, -(-len(server.catalog) // server.page_size))
+            start = (min(page, last) - 1) * server.page_size
+            body = nextjs_html(server.catalog[start:start + server.page_size]).encode("utf-8")
+            self._reply(200, "text/html; charset=utf-8", body)
+        else:
+            self._reply(404, "text/plain", b"not found")
+
+    def _reply(self, status, mime, body):
+        self.server.requests_served += 1
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockCatalogServer:
+    """本地分页站点替身:
+    - GET /api/products?page=N&limit=M (或 offset=)，超出总量后返回空列表
+    - GET /c/<slug>?page=N，Next.js SSR 分类页，超出总量后重复最后一页
+    """
+
+    def __init__(self, total_items=800, page_size=40, seed=0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.catalog = make_products(random.Random(seed), total_items)
+        self.httpd.page_size = page_size
+        self.httpd.requests_served = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    @property
+    def site_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests_served(self):
+        return self.httpd.requests_served
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
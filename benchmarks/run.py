@@ -0,0 +1,183 @@
+"""离线基准测试: python -m benchmarks.run [--entries N] [--body-kb K] [--save-baseline] [--compare]"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import metrics
+from raw_store import RawStore
+from benchmarks.import_time import measure_import_time
+from benchmarks.mock_server import MockCatalogServer
+from benchmarks.stub_llm import StubLLM
+from benchmarks.synthetic_har import write_har
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+
+
+def _point_config_at(work_dir):
+    """把所有任务路径重定向到临时目录，避免污染真实 data 目录。"""
+    config.settings.override(PROJECT_NAME="bench", BASE_DATA_DIR=work_dir)
+    os.makedirs(config.RAW_DATA_DIR, exist_ok=True)
+
+
+class Bench:
+    def __init__(self):
+        self.metrics = metrics.new_run("bench")
+        self.results = {}
+
+    def measure(self, name, func, units=None, unit_name="items"):
+        """执行 func 并记录耗时、峰值 RSS；units 为处理量 (数值或可调用对象)，用于计算吞吐。"""
+        print(f"[*] [Bench] {name} ...")
+        start = time.perf_counter()
+        with self.metrics.stage(name):
+            ret = func()
+        elapsed = time.perf_counter() - start
+        count = units(ret) if callable(units) else units
+
+        stage = self.metrics.stages[name]
+        res = {"seconds": round(elapsed, 4), "peak_rss_mb": round(stage["peak_rss_mb"], 1)}
+        if count:
+            res[unit_name] = count
+            res[f"{unit_name}_per_sec"] = round(count / elapsed, 2) if elapsed > 0 else None
+        self.results[name] = res
+        print(f"    -> {json.dumps(res, ensure_ascii=False)}")
+        return ret
+
+
+def run_suite(args):
+    from api_runner import ApiRunner
+    from llm_client import LLMClient
+    from html_runner import HtmlRunner
+    from processor import DataProcessor
+    from strategy_selector import StrategySelector
+
+    bench = Bench()
+
+    # 0. 启动开销: 全新解释器中导入入口模块的耗时 (-X importtime)
+    for module in ("main", "strategy_selector"):
+        res = measure_import_time(module)
+        bench.results[f"import_{module}"] = res
+        print(f"[*] [Bench] import {module}: {res['seconds'] * 1000:.1f} ms")
+
+    work_dir = tempfile.mkdtemp(prefix="crawler_bench_")
+    _point_config_at(work_dir)
+
+    try:
+        with MockCatalogServer(total_items=args.api_items, page_size=args.page_size) as server:
+            write_har(config.HAR_PATH, entries=args.entries, body_kb=args.body_kb, seed=args.seed,
+                      api_base=server.base_url)
+            har_mb = os.path.getsize(config.HAR_PATH) / (1024 * 1024)
+            print(f"[*] [Bench] 合成 HAR: {args.entries} entries, {har_mb:.1f} MB")
+
+            # 1. 策略选择
+            selector = StrategySelector()
+            bench.measure("select", selector.select, units=round(har_mb, 2), unit_name="har_mb")
+
+            # 2. HTML 挖掘 (扫描整个 HAR)
+            bench.measure("html_runner", HtmlRunner().run,
+                          units=lambda _: len(RawStore()), unit_name="pages")
+
+            # 3. SSR 多页抓取 (本地替身站点, 无浏览器)
+            first_url = f"{server.site_url}/c/bench?page=1"
+            with urllib.request.urlopen(first_url) as resp:
+                first_html = resp.read().decode("utf-8")
+            ssr_entry = {"request": {"method": "GET", "url": first_url, "headers": [], "cookies": []},
+                         "response": {"content": {"mimeType": "text/html", "text": first_html}}}
+            bench.measure("ssr_crawl", lambda: HtmlRunner().run(entry=ssr_entry, crawl=True),
+                          units=lambda _: len(RawStore()), unit_name="pages")
+
+            # 4. API 翻页 (本地替身服务 + stub LLM)
+            with open(config.HAR_PATH, encoding="utf-8") as f:
+                entries = json.load(f)["log"]["entries"]
+            api_entry = next(e for e in entries if e["request"]["url"].startswith(server.base_url))
+            runner = ApiRunner(llm=LLMClient(client=StubLLM()))
+            served_before = server.requests_served
+            bench.measure("pagination", lambda: runner.run(api_entry),
+                          units=lambda _: server.requests_served - served_before, unit_name="requests")
+
+            # 5. 处理 (stub LLM 生成解析器 + 导出 Excel)
+            processor = DataProcessor(llm=LLMClient(client=StubLLM()))
+            bench.measure("processor", processor.run,
+                          units=lambda _: len(RawStore()), unit_name="pages")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "params": {k: getattr(args, k) for k in ("entries", "body_kb", "api_items", "page_size", "seed")},
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": bench.results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """逐项对比耗时与峰值内存，超过阈值 (比例) 视为回归。"""
+    regressions = []
+    print("\n--- 与基线对比 ---")
+    if current["params"] != baseline.get("params"):
+        print(f"[!] 参数与基线不同: {baseline.get('params')}")
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<16} (基线中无此项)")
+            continue
+        for key in ("seconds", "peak_rss_mb"):
+            if not base.get(key) or key not in cur: continue
+            delta = (cur[key] - base[key]) / base[key]
+            flag = ""
+            if delta > threshold:
+                flag = "  <-- 回归"
+                regressions.append(f"{name}.{key}")
+            print(f"{name:<16} {key:<12} {base[key]:>10} -> {cur[key]:>10} ({delta:+.1%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="auto crawler 离线基准测试")
+    parser.add_argument("--entries", type=int, default=200, help="合成 HAR 的请求数")
+    parser.add_argument("--body-kb", type=int, default=60, help="页面 / API 响应体积 (KB)")
+    parser.add_argument("--api-items", type=int, default=800, help="本地分页 API 的商品总数")
+    parser.add_argument("--page-size", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线对比，出现回归时返回非零")
+    parser.add_argument("--threshold", type=float, default=0.2, help="回归阈值 (比例)")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[√] 结果已写入: {args.output}")
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"[√] 基线已更新: {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"[!] 基线不存在: {args.baseline}")
+            return 1
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
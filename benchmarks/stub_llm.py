@@ -0,0 +1,124 @@
+import json
+import re
+from types import SimpleNamespace
+
+# 通用翻页脚本: 递归寻找包含最多 Dict 的 List，按 page / offset 翻页
+SCRAPER_TEMPLATE = '''
+URL = {url!r}
+HEADERS = {headers!r}
+PARAMS = {params!r}
+
+
+def _largest_list(obj):
+    best = []
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            if sum(isinstance(x, dict) for x in cur) > len(best):
+                best = cur
+            stack.extend(cur)
+    return best
+
+
+def scrape(params=None):
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    params = dict(PARAMS, **(params or {{}}))
+    size = int(params.get("limit", 20))
+    prev = None
+    for n in range(1, 31):
+        resp = session.get(URL, params=params, timeout=15)
+        data = resp.json()
+        items = _largest_list(data)
+        print(f"Page {{n}} fetched: {{len(items)}} items found.")
+        if not items or items == prev:
+            break
+        yield data
+        prev = items
+        if "offset" in params:
+            params["offset"] = int(params["offset"]) + size
+        else:
+            params["page"] = int(params.get("page", 1)) + 1
+'''
+
+# 通用解析函数: 找到最大的商品 List，将 variants 展开为 SKU 行
+PARSER_CODE = '''
+def _largest_list(obj):
+    best = []
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            if sum(isinstance(x, dict) for x in cur) > len(best):
+                best = cur
+            stack.extend(cur)
+    return best
+
+
+def parse_json(data):
+    rows = []
+    for product in _largest_list(data):
+        if not isinstance(product, dict):
+            continue
+        base = {k: v for k, v in product.items() if not isinstance(v, (list, dict))}
+        price = product.get("price")
+        if isinstance(price, dict):
+            base["current_price"] = price.get("current")
+            base["original_price"] = price.get("original")
+        variants = product.get("variants") or [{}]
+        for v in variants:
+            row = dict(base)
+            if isinstance(v, dict):
+                row.update({f"variant_{k}": val for k, val in v.items() if not isinstance(val, (list, dict))})
+            rows.append(row)
+    return rows
+'''
+
+
+class _Completions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        prompt = messages[-1]["content"] if messages else ""
+        self.owner.calls += 1
+        if "parse_json" in prompt:
+            code = PARSER_CODE
+        else:
+            code = self._scraper_code(prompt)
+        content = f"```python\n{code}\n```\n以上代码说明略。"
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        if stream:
+            return self._stream(content, usage)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage, model=model)
+
+    def _stream(self, content, usage):
+        # 模拟流式分片: 每 16 个字符一个 chunk，最后一个 chunk 携带 usage
+        for i in range(0, len(content), 16):
+            delta = SimpleNamespace(content=content[i:i + 16])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+    def _scraper_code(self, prompt):
+        url = re.search(r"初始 URL:\s*(\S+)", prompt)
+        params = re.search(r"初始参数:\s*(\{.*?\})\n", prompt)
+        headers = re.search(r"Headers:\s*(\{.*?\})\n", prompt)
+        return SCRAPER_TEMPLATE.format(
+            url=url.group(1) if url else "",
+            params=json.loads(params.group(1)) if params else {},
+            headers=json.loads(headers.group(1)) if headers else {},
+        )
+
+
+class StubLLM:
+    """确定性的 OpenAI 客户端替身: 根据 prompt 返回固定的翻页脚本或解析函数，不访问网络。"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
@@ -0,0 +1,129 @@
+import json
+import random
+
+# 各类响应的默认占比: Next.js / JSON-LD / Shopify 页面, JSON API, 以及静态资源噪声
+DEFAULT_MIX = {"nextjs": 1, "jsonld": 1, "shopify": 1, "api": 2, "noise": 5}
+
+COLORS = ["black", "white", "navy", "red", "olive", "grey", "pink", "blue"]
+SIZES = ["XS", "S", "M", "L", "XL"]
+
+
+def make_products(rng, count, start=0):
+    products = []
+    for i in range(start, start + count):
+        price = round(rng.uniform(9, 199), 2)
+        products.append({
+            "id": f"P{i:07d}",
+            "name": f"Synthetic Product {i}",
+            "brand": rng.choice(["Acme", "Globex", "Initech"]),
+            "price": {"current": price, "original": round(price * 1.25, 2), "currency": "USD"},
+            "image": f"https://images.example.com/p/{i}.jpg",
+            "category": rng.choice(["tops", "bottoms", "shoes", "accessories"]),
+            "variants": [{"sku": f"P{i:07d}-{c}-{s}", "color": c, "size": s, "stock": rng.randint(0, 50)}
+                         for c in rng.sample(COLORS, 2) for s in rng.sample(SIZES, 2)],
+        })
+    return products
+
+
+def _products_for_size(rng, body_kb, start):
+    # 单个商品序列化后约 0.5KB
+    return make_products(rng, max(1, int(body_kb * 1024 / 512)), start)
+
+
+def _grid_html(products):
+    cells = "".join(f'<div class="tile"><a href="/p/{p["id"]}">{p["name"]}</a>'
+                    f'<span class="price">${p["price"]["current"]:.2f}</span></div>' for p in products)
+    return f'<div class="grid">{cells}</div>'
+
+
+def nextjs_page(rng, body_kb, start=0):
+    return nextjs_html(_products_for_size(rng, body_kb * 0.85, start))
+
+
+def nextjs_html(products):
+    next_data = {"props": {"pageProps": {"category": {"products": products, "total": len(products)}}},
+                 "page": "/c/[slug]", "buildId": "bench"}
+    return ("<html><head><title>Shop</title></head><body>" + _grid_html(products) +
+            f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>'
+            "</body></html>")
+
+
+def jsonld_page(rng, body_kb, start=0):
+    products = _products_for_size(rng, body_kb * 0.85, start)
+    item_list = {
+        "@context": "https://schema.org", "@type": "ItemList",
+        "itemListElement": [{
+            "@type": "ListItem", "position": n + 1,
+            "item": {"@type": "Product", "name": p["name"], "sku": p["id"], "brand": {"@type": "Brand", "name": p["brand"]},
+                     "image": p["image"],
+                     "offers": [{"@type": "Offer", "price": p["price"]["current"], "priceCurrency": "USD",
+                                 "sku": v["sku"], "availability": "https://schema.org/InStock"} for v in p["variants"]]}
+        } for n, p in enumerate(products)]
+    }
+    return ("<html><head>" f'<script type="application/ld+json">{json.dumps(item_list)}</script>'
+            "</head><body>" + _grid_html(products) + "</body></html>")
+
+
+def shopify_page(rng, body_kb, start=0):
+    products = _products_for_size(rng, body_kb * 0.85, start)
+    meta = {"products": [{"id": p["id"], "vendor": p["brand"], "type": p["category"],
+                          "variants": [{"id": v["sku"], "price": int(p["price"]["current"] * 100),
+                                        "name": f'{p["name"]} - {v["color"]} / {v["size"]}', "public_title": f'{v["color"]} / {v["size"]}',
+                                        "sku": v["sku"]} for v in p["variants"]]} for p in products],
+            "page": {"pageType": "collection"}}
+    return ("<html><head><script>window.Shopify = window.Shopify || {};\n"
+            f"var meta = {json.dumps(meta)};\n</script></head><body>" + _grid_html(products) + "</body></html>")
+
+
+def api_body(rng, body_kb, start=0):
+    products = _products_for_size(rng, body_kb, start)
+    return json.dumps({"data": {"search": {"total": len(products) * 10, "products": products}},
+                       "meta": {"page": 1, "limit": len(products)}})
+
+
+def _entry(url, mime, text, method="GET", query=None):
+    return {
+        "request": {
+            "method": method, "url": url,
+            "headers": [{"name": "User-Agent", "value": "bench"}, {"name": "Accept", "value": "*/*"},
+                        {"name": "Cookie", "value": "session=bench"}],
+            "queryString": [{"name": k, "value": str(v)} for k, v in (query or {}).items()],
+        },
+        "response": {"status": 200, "headers": [{"name": "Content-Type", "value": mime}],
+                     "content": {"mimeType": mime, "size": len(text), "text": text}},
+    }
+
+
+def build_har(entries=200, body_kb=50, mix=None, seed=0, site="https://www.example.com", api_base=None):
+    """生成确定性的合成 HAR: entries 个请求，按 mix 权重混合各类响应，页面/API 体积约 body_kb KB。"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = [k for k, w in mix.items() for _ in range(w)]
+    api_base = api_base or f"{site}/api"
+
+    har_entries = []
+    for i in range(entries):
+        kind = kinds[i % len(kinds)]
+        start = i * 1000
+        if kind == "nextjs":
+            har_entries.append(_entry(f"{site}/c/category-{i}?page=1", "text/html", nextjs_page(rng, body_kb, start)))
+        elif kind == "jsonld":
+            har_entries.append(_entry(f"{site}/c/ld-{i}?page=1", "text/html", jsonld_page(rng, body_kb, start)))
+        elif kind == "shopify":
+            har_entries.append(_entry(f"{site}/collections/all-{i}?page=1", "text/html", shopify_page(rng, body_kb, start)))
+        elif kind == "api":
+            query = {"page": 1, "limit": 40, "category": "tops"}
+            qs = "&".join(f"{k}={v}" for k, v in query.items())
+            har_entries.append(_entry(f"{api_base}/products?{qs}", "application/json", api_body(rng, body_kb, start), query=query))
+        else:
+            ext = rng.choice([".js", ".css", ".png", ".woff"])
+            har_entries.append(_entry(f"{site}/static/asset-{i}{ext}", "application/octet-stream", "x" * rng.randint(200, 4000)))
+
+    return {"log": {"version": "1.2", "creator": {"name": "synthetic_har"}, "entries": har_entries}}
+
+
+def write_har(path, **kwargs):
+    har = build_har(**kwargs)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(har, f, ensure_ascii=False)
+    return har
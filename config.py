@@ -1,5 +1,6 @@
 import os
 import sys
+from functools import cached_property
 from urllib.parse import urlparse
 
 # ==================== 业务配置 ====================
@@ -9,6 +10,58 @@ SCROLL_COUNT = 10
 WAIT_TIME = 10
 HEADLESS = True
 
+# 生成翻页脚本的单次最大页数；总量超过 页数 x 每页条数 时按 facet / 价格区间分片并行抓取
+SCRAPER_MAX_PAGES = 30
+
+# 生成代码沙箱: 预热 worker 数量与单次执行限额；解析时每 PARSER_CHUNK_PAGES 页为一次调用，单独计 PARSER_WALL_SECONDS
+SANDBOX_WORKERS = 4
+SANDBOX_CPU_SECONDS = 120
+SANDBOX_MEMORY_MB = 2048
+SANDBOX_WALL_SECONDS = 600
+PARSER_WALL_SECONDS = 120
+PARSER_CHUNK_PAGES = 20
+
+# LLM 代码生成: 总超时 (秒)，主模型超过 LLM_HEDGE_DELAY 秒未完成时对冲请求备用模型
+LLM_TIMEOUT = 180
+LLM_HEDGE_DELAY = 45
+
+# SSR 多页抓取: 不启动浏览器，直接按推断的翻页规则并发请求后续页面；
+# 429 / 5xx 与网络异常按指数退避重试 SSR_FETCH_RETRIES 次 (首次等待 SSR_RETRY_BACKOFF 秒)
+SSR_CRAWL = True
+SSR_MAX_PAGES = 50
+SSR_CONCURRENCY = 4
+SSR_PARSE_WORKERS = 2
+SSR_FETCH_TIMEOUT = 15
+SSR_FETCH_RETRIES = 3
+SSR_RETRY_BACKOFF = 1
+
+# 原始分页存储: zstd 压缩级别 (未安装 zstandard 时退化为 zlib)
+RAW_STORE_ZSTD_LEVEL = 3
+
+# 运行指标: RSS 采样间隔 (秒)，可选 Prometheus textfile / StatsD 导出
+METRICS_SAMPLE_INTERVAL = 0.05
+METRICS_PROMETHEUS_FILE = os.environ.get("METRICS_PROMETHEUS_FILE", "")
+METRICS_STATSD_ADDR = os.environ.get("METRICS_STATSD_ADDR", "")
+
+# HTTP 条件请求缓存: 保存 ETag / Last-Modified 与响应体，重跑时 304 直接使用本地副本；
+# 解析结果缓存: 内容未变的页面复用上次的解析结果，页面结构未变时复用上次的解析器
+HTTP_CACHE = True
+PARSE_CACHE = True
+
+# 商品身份去重: 翻页时已出现商品占比达到 PAGINATION_SEEN_RATIO 即停止；
+# 精确记录前 ITEM_TRACKER_EXACT_LIMIT 个商品，超出后转为 Bloom 过滤器 (按容量与误判率定长分配)
+PAGINATION_SEEN_RATIO = 0.9
+ITEM_TRACKER_EXACT_LIMIT = 200000
+ITEM_TRACKER_CAPACITY = 10000000
+ITEM_TRACKER_ERROR_RATE = 0.001
+
+# 分布式抓取队列: redis://... 使用 Redis (多节点)，sqlite:///<path> 或留空使用任务目录下的 SQLite 文件
+WORK_QUEUE_URL = os.environ.get("CRAWLER_QUEUE_URL", "")
+WORK_LEASE_SECONDS = 300
+WORK_MAX_ATTEMPTS = 3
+WORK_RETRY_DELAY = 10
+WORK_POLL_INTERVAL = 2
+
 # ==================== 动态路径生成逻辑 ====================
 def get_project_name(url):
     try:
@@ -24,30 +77,121 @@ def get_project_name(url):
     except:
         return "default_task"
 
-# 1. 获取项目名
-PROJECT_NAME = get_project_name(TARGET_URL)
+# ==================== 延迟解析的任务配置 ====================
+class Settings:
+    """项目名、目录路径与 LLM 配置在首次访问时才解析 (Airflow Variable 查询、目录探测均推迟到此时)。
+
+    模块级属性 (如 config.HAR_PATH) 通过模块 __getattr__ 转发到这里；override() 可整体替换根目录等取值，
+    派生路径会随之重新计算。
+    """
+
+    LAZY_FIELDS = ("PROJECT_NAME", "BASE_ROOT_DIR", "BASE_DATA_DIR", "HAR_PATH", "RAW_DATA_DIR", "RAW_JSON_PATH",
+                   "RESULT_EXCEL", "GENERATED_SCRAPER_PATH", "METRICS_DIR", "PARSED_DATA_DIR", "WORK_QUEUE_DB",
+                   "HTTP_CACHE_DIR", "PARSE_CACHE_DIR",
+                   "LLM_CONFIG", "LLM_API_KEY", "LLM_BASE_URL", "LLM_MODEL", "LLM_FALLBACK_MODEL")
+
+    def __init__(self):
+        self._overrides = {}
+
+    def override(self, **values):
+        unknown = set(values) - set(self.LAZY_FIELDS)
+        if unknown: raise AttributeError(f"未知配置项: {sorted(unknown)}")
+        for name in self.LAZY_FIELDS:
+            self.__dict__.pop(name, None)
+        self._overrides.update(values)
+        self.__dict__.update(self._overrides)
+
+    # 1. 获取项目名
+    @cached_property
+    def PROJECT_NAME(self):
+        return get_project_name(TARGET_URL)
+
+    # 2. 确定 Base Data 目录
+    @cached_property
+    def BASE_ROOT_DIR(self):
+        if os.path.exists("/opt/airflow"):
+            print("[Config] 运行环境: Airflow 容器")
+            return "/opt/airflow/data"
+        # 定位到 data 文件夹
+        print(f"[Config] 运行环境: 本地 Windows")
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
+
+    # 3. 拼接具体项目路径 (data/gap/)
+    @cached_property
+    def BASE_DATA_DIR(self):
+        path = os.path.join(self.BASE_ROOT_DIR, self.PROJECT_NAME)
+        print(f"[Config] 当前任务工作目录: {path}")
+        return path
+
+    # 4. 定义具体文件路径 (全部基于 BASE_DATA_DIR)
+    @cached_property
+    def HAR_PATH(self):
+        return os.path.join(self.BASE_DATA_DIR, "site.har")
+
+    @cached_property
+    def RAW_DATA_DIR(self):
+        return os.path.join(self.BASE_DATA_DIR, "raw")
+
+    @cached_property
+    def RAW_JSON_PATH(self):
+        return os.path.join(self.BASE_DATA_DIR, "raw_data.json")
+
+    @cached_property
+    def RESULT_EXCEL(self):
+        return os.path.join(self.BASE_DATA_DIR, f"{self.PROJECT_NAME}_result.xlsx")
+
+    @cached_property
+    def GENERATED_SCRAPER_PATH(self):
+        return os.path.join(self.BASE_DATA_DIR, "generated_scraper.py")
+
+    @cached_property
+    def METRICS_DIR(self):
+        return os.path.join(self.BASE_DATA_DIR, "metrics")
 
-# 2. 确定 Base Data 目录
-if os.path.exists("/opt/airflow"):
-    BASE_ROOT_DIR = "/opt/airflow/data"
-    print("[Config] 运行环境: Airflow 容器")
-else:
-    # 定位到 data 文件夹
-    BASE_ROOT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
-    BASE_ROOT_DIR = os.path.abspath(BASE_ROOT_DIR)
-    print(f"[Config] 运行环境: 本地 Windows")
+    @cached_property
+    def PARSED_DATA_DIR(self):
+        return os.path.join(self.BASE_DATA_DIR, "parsed")
 
-# 3. 拼接具体项目路径 (data/gap/)
-BASE_DATA_DIR = os.path.join(BASE_ROOT_DIR, PROJECT_NAME)
+    @cached_property
+    def WORK_QUEUE_DB(self):
+        return os.path.join(self.BASE_DATA_DIR, "queue.db")
 
-print(f"[Config] 当前任务工作目录: {BASE_DATA_DIR}")
+    @cached_property
+    def HTTP_CACHE_DIR(self):
+        return os.path.join(self.BASE_DATA_DIR, "http_cache")
 
-# 4. 定义具体文件路径 (全部基于 BASE_DATA_DIR)
-HAR_PATH = os.path.join(BASE_DATA_DIR, "site.har")
-RAW_DATA_DIR = os.path.join(BASE_DATA_DIR, "raw")
-RAW_JSON_PATH = os.path.join(BASE_DATA_DIR, "raw_data.json")
-RESULT_EXCEL = os.path.join(BASE_DATA_DIR, f"{PROJECT_NAME}_result.xlsx")
-GENERATED_SCRAPER_PATH = os.path.join(BASE_DATA_DIR, "generated_scraper.py")
+    @cached_property
+    def PARSE_CACHE_DIR(self):
+        return os.path.join(self.BASE_DATA_DIR, "parse_cache")
+
+    @cached_property
+    def LLM_CONFIG(self):
+        return get_llm_config()
+
+    @cached_property
+    def LLM_API_KEY(self):
+        return self.LLM_CONFIG['LLM_API_KEY']
+
+    @cached_property
+    def LLM_BASE_URL(self):
+        return self.LLM_CONFIG['LLM_BASE_URL']
+
+    @cached_property
+    def LLM_MODEL(self):
+        return self.LLM_CONFIG['LLM_MODEL']
+
+    @cached_property
+    def LLM_FALLBACK_MODEL(self):
+        return self.LLM_CONFIG.get('LLM_FALLBACK_MODEL', '')
+
+
+settings = Settings()
+
+
+def __getattr__(name):
+    if name in Settings.LAZY_FIELDS:
+        return getattr(settings, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ==================== LLM 配置 ====================
@@ -55,7 +199,8 @@ def get_llm_config():
     config = {
         'LLM_API_KEY': '',
         'LLM_BASE_URL': 'https://api.deepseek.com',
-        'LLM_MODEL': 'deepseek-reasoner'
+        'LLM_MODEL': 'deepseek-reasoner',
+        'LLM_FALLBACK_MODEL': 'deepseek-chat'
     }
 
     try:
@@ -63,12 +208,14 @@ def get_llm_config():
         config['LLM_API_KEY'] = Variable.get("LLM_API_KEY", default_var="")
         config['LLM_BASE_URL'] = Variable.get("LLM_BASE_URL", default_var=config['LLM_BASE_URL'])
         config['LLM_MODEL'] = Variable.get("LLM_MODEL", default_var=config['LLM_MODEL'])
+        config['LLM_FALLBACK_MODEL'] = Variable.get("LLM_FALLBACK_MODEL", default_var=config['LLM_FALLBACK_MODEL'])
         print("[Config] 配置来源: Airflow Variables")
     except (ImportError, Exception):
 
         config['LLM_API_KEY'] = os.environ.get("LLM_API_KEY", "")
         config['LLM_BASE_URL'] = os.environ.get("LLM_BASE_URL", config['LLM_BASE_URL'])
         config['LLM_MODEL'] = os.environ.get("LLM_MODEL", config['LLM_MODEL'])
+        config['LLM_FALLBACK_MODEL'] = os.environ.get("LLM_FALLBACK_MODEL", config['LLM_FALLBACK_MODEL'])
 
         if os.environ.get("LLM_API_KEY"):
             print("[Config] 配置来源: 环境变量")
@@ -89,19 +236,13 @@ def get_llm_config():
     return config
 
 
-LLM_CONFIG = get_llm_config()
-LLM_API_KEY = LLM_CONFIG['LLM_API_KEY']
-LLM_BASE_URL = LLM_CONFIG['LLM_BASE_URL']
-LLM_MODEL = LLM_CONFIG['LLM_MODEL']
-
-
 # ==================== 工具函数 ====================
 def ensure_dirs():
-    os.makedirs(BASE_DATA_DIR, exist_ok=True)
-    os.makedirs(RAW_DATA_DIR, exist_ok=True)
-    print(f"[Config] 已创建任务目录: {BASE_DATA_DIR}")
+    os.makedirs(settings.BASE_DATA_DIR, exist_ok=True)
+    os.makedirs(settings.RAW_DATA_DIR, exist_ok=True)
+    print(f"[Config] 已创建任务目录: {settings.BASE_DATA_DIR}")
 
 if __name__ == "__main__":
     ensure_dirs()
-    print(f"Target Project: {PROJECT_NAME}")
-    print(f"HAR Save Path: {HAR_PATH}")
\ No newline at end of file
+    print(f"Target Project: {settings.PROJECT_NAME}")
+    print(f"HAR Save Path: {settings.HAR_PATH}")
\ No newline at end of file
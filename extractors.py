@@ -0,0 +1,245 @@
+import re
+
+SCHEMA_PREFIX = re.compile(r'^https?://schema\.org/', re.I)
+GTIN_KEYS = ['gtin', 'gtin13', 'gtin12', 'gtin14', 'gtin8']
+LIST_PRICE_TYPES = ['ListPrice', 'StrikethroughPrice', 'SRP', 'MSRP']
+
+
+def _as_list(value):
+    if value is None: return []
+    return value if isinstance(value, list) else [value]
+
+
+def _types(node):
+    return {SCHEMA_PREFIX.sub('', str(t)) for t in _as_list(node.get('@type')) if t}
+
+
+def _text(value):
+    # schema.org 字段既可能是字符串，也可能是 {"@type": "Brand", "name": ...} 这类对象
+    if isinstance(value, list): value = value[0] if value else None
+    if isinstance(value, dict): value = value.get('name') or value.get('url') or value.get('contentUrl')
+    if isinstance(value, str): value = SCHEMA_PREFIX.sub('', value.strip())
+    return value
+
+
+def _number(value):
+    if isinstance(value, bool) or value is None: return None
+    if isinstance(value, (int, float)): return value
+    try:
+        return float(str(value).strip().replace(',', ''))
+    except ValueError:
+        return None
+
+
+def _clean(row):
+    return {k: v for k, v in row.items() if v is not None and v != '' and v != []}
+
+
+class Extractor:
+    """内置解析器: 针对已知的标准数据结构直接生成与 LLM 解析器相同的 SKU 行，无需生成代码。
+
+    sources 为 html_mining 页面中使用的数据键，为空表示作用于 API 原始响应。
+    """
+    name = None
+    sources = ()
+
+    def applies(self, page):
+        if not isinstance(page, dict): return False
+        if page.get('extraction_type') == 'html_mining':
+            data = page.get('data') or {}
+            return bool(self.sources) and any(data.get(s) for s in self.sources)
+        return not self.sources and self.matches(page)
+
+    def matches(self, data):
+        return False
+
+    def rows(self, data):
+        raise NotImplementedError
+
+    def __call__(self, page):
+        if page.get('extraction_type') == 'html_mining':
+            data = page.get('data') or {}
+            return [row for s in self.sources for row in self.rows(data.get(s))]
+        return self.rows(page) if self.matches(page) else []
+
+    def __repr__(self):
+        return f"<内置解析器 {self.name}>"
+
+
+class JsonLdExtractor(Extractor):
+    """schema.org JSON-LD: Product / ProductGroup(hasVariant) / ItemList / Offer / AggregateOffer。"""
+    name = "json_ld"
+    sources = ('json_ld',)
+
+    def _products(self, blocks):
+        # 找出所有 Product 节点 (含 @graph、ItemList.itemListElement[*].item)，不进入 Product 内部；
+        # 只收集直属于 ItemList 的 ListItem，BreadcrumbList 中的面包屑不是商品
+        found, list_items = [], []
+        stack = [(blocks, False)]
+        while stack:
+            cur, in_item_list = stack.pop()
+            if isinstance(cur, list):
+                stack.extend((v, in_item_list) for v in reversed(cur))
+            elif isinstance(cur, dict):
+                types = _types(cur)
+                if types & {'Product', 'ProductGroup', 'IndividualProduct', 'ProductModel'}:
+                    found.append(cur)
+                    continue
+                if 'ListItem' in types and not isinstance(cur.get('item'), dict):
+                    if in_item_list: list_items.append(cur)
+                    continue
+                children = [v for v in cur.values() if isinstance(v, (dict, list))]
+                stack.extend((v, 'ItemList' in types) for v in reversed(children))
+        return found, list_items
+
+    def _base(self, product):
+        rating = product.get('aggregateRating') if isinstance(product.get('aggregateRating'), dict) else {}
+        return _clean({
+            "product_id": _text(product.get('productID') or product.get('productGroupID') or product.get('@id')),
+            "sku": _text(product.get('sku')),
+            "gtin": next((_text(product[k]) for k in GTIN_KEYS if product.get(k)), None),
+            "mpn": _text(product.get('mpn')),
+            "name": _text(product.get('name')),
+            "brand": _text(product.get('brand')),
+            "category": _text(product.get('category')),
+            "color": _text(product.get('color')),
+            "size": _text(product.get('size')),
+            "material": _text(product.get('material')),
+            "image_url": _text(product.get('image')),
+            "url": _text(product.get('url')),
+            "rating": _number(rating.get('ratingValue')),
+            "review_count": _number(rating.get('reviewCount') or rating.get('ratingCount')),
+        })
+
+    def _offers(self, offers):
+        rows = []
+        for offer in _as_list(offers):
+            if not isinstance(offer, dict): continue
+            if 'AggregateOffer' in _types(offer) and offer.get('offers'):
+                rows.extend(self._offers(offer['offers']))
+                continue
+            original = None
+            for spec in _as_list(offer.get('priceSpecification')):
+                if isinstance(spec, dict) and any(t in str(spec.get('priceType', '')) for t in LIST_PRICE_TYPES):
+                    original = _number(spec.get('price'))
+            rows.append(_clean({
+                "sku": _text(offer.get('sku')),
+                "current_price": _number(offer.get('price') if offer.get('price') is not None else offer.get('lowPrice')),
+                "original_price": original if original is not None else _number(offer.get('highPrice')),
+                "currency": _text(offer.get('priceCurrency')),
+                "availability": _text(offer.get('availability')),
+                "stock": _number((offer.get('inventoryLevel') or {}).get('value')
+                                 if isinstance(offer.get('inventoryLevel'), dict) else offer.get('inventoryLevel')),
+            }))
+        return rows
+
+    def _product_rows(self, product, parent=None):
+        base = dict(parent or {}, **self._base(product))
+        variants = [v for v in _as_list(product.get('hasVariant')) if isinstance(v, dict)]
+        if variants:
+            base["product_group_id"] = base.pop("product_id", None)
+            return [row for v in variants for row in self._product_rows(v, _clean(base))]
+        # 每个 Offer 对应一个 SKU，父级商品字段复制到每一行
+        offers = self._offers(product.get('offers'))
+        return [dict(base, **offer) for offer in offers] if offers else [base]
+
+    def rows(self, blocks):
+        products, list_items = self._products(blocks)
+        rows = [row for p in products for row in self._product_rows(p)]
+        if not rows:
+            # 只有 URL 列表的 ItemList (类目页常见)
+            rows = [_clean({"position": _number(li.get('position')), "name": _text(li.get('name')),
+                            "url": _text(li.get('url') or li.get('item')), "image_url": _text(li.get('image'))})
+                    for li in list_items]
+        return rows
+
+
+class ShopifyMetaExtractor(Extractor):
+    """Shopify 页面内的 `var meta = {...}`: 列表页为 products[*].variants，详情页为 product.variants。价格单位为分。"""
+    name = "shopify_meta"
+    sources = ('shopify_meta',)
+
+    def rows(self, meta):
+        if not isinstance(meta, dict): return []
+        products = meta.get('products') or _as_list(meta.get('product'))
+        rows = []
+        for p in products:
+            if not isinstance(p, dict): continue
+            base = {"product_id": p.get('id'), "brand": p.get('vendor'), "product_type": p.get('type')}
+            for v in p.get('variants') or [{}]:
+                if not isinstance(v, dict): continue
+                price = _number(v.get('price'))
+                rows.append(_clean(dict(base, **{
+                    "variant_id": v.get('id'),
+                    "sku": v.get('sku'),
+                    "name": v.get('name'),
+                    "variant_title": v.get('public_title'),
+                    "current_price": price / 100 if price is not None else None,
+                })))
+        return rows
+
+
+class ShopifyProductsExtractor(Extractor):
+    """Shopify 的 /products.json 与 /products/<handle>.json 接口响应。"""
+    name = "shopify_products"
+
+    def _products(self, data):
+        products = data.get('products') if isinstance(data.get('products'), list) else _as_list(data.get('product'))
+        return [p for p in products if isinstance(p, dict)]
+
+    def matches(self, data):
+        products = self._products(data)
+        return bool(products) and all('variants' in p and ('handle' in p or 'product_type' in p) for p in products)
+
+    def rows(self, data):
+        rows = []
+        for p in self._products(data):
+            images = [img.get('src') for img in p.get('images') or [] if isinstance(img, dict)]
+            option_names = [str(o.get('name', '')).strip().lower().replace(' ', '_')
+                            for o in p.get('options') or [] if isinstance(o, dict)]
+            tags = p.get('tags')
+            base = {
+                "product_id": p.get('id'), "name": p.get('title'), "handle": p.get('handle'),
+                "brand": p.get('vendor'), "product_type": p.get('product_type'),
+                "tags": ", ".join(tags) if isinstance(tags, list) else tags,
+                "image_url": images[0] if images else None,
+            }
+            for v in p.get('variants') or [{}]:
+                if not isinstance(v, dict): continue
+                row = dict(base, **{
+                    "variant_id": v.get('id'),
+                    "variant_title": v.get('title'),
+                    "sku": v.get('sku'),
+                    "current_price": _number(v.get('price')),
+                    "original_price": _number(v.get('compare_at_price')),
+                    "available": v.get('available'),
+                    "stock": v.get('inventory_quantity'),
+                })
+                # option1/2/3 按 options 名称映射为 color / size 等字段
+                for i, opt in enumerate(option_names[:3], 1):
+                    if opt and opt != 'title': row[opt] = v.get(f'option{i}')
+                if isinstance(v.get('featured_image'), dict):
+                    row["image_url"] = v['featured_image'].get('src') or row["image_url"]
+                rows.append(_clean(row))
+        return rows
+
+
+EXTRACTORS = [JsonLdExtractor(), ShopifyMetaExtractor(), ShopifyProductsExtractor()]
+
+
+def by_name(name):
+    return next((e for e in EXTRACTORS if e.name == name), None)
+
+
+def match(page):
+    """按 extraction_type 与数据键选出适用的内置解析器 (样本页产出行数最多者)，均不适用时返回 None。"""
+    best, best_rows = None, 0
+    for extractor in EXTRACTORS:
+        if not extractor.applies(page): continue
+        try:
+            count = len(extractor(page))
+        except Exception:
+            continue
+        if count > best_rows:
+            best, best_rows = extractor, count
+    return best
@@ -2,7 +2,6 @@ import time
 import os
 import random
 import config
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 
 
 class HarRecorder:
@@ -66,6 +65,7 @@ class HarRecorder:
                 print(f"    [!] 滚动异常: {e}")
 
     def run(self):
+        from playwright.sync_api import sync_playwright
         os.makedirs(os.path.dirname(config.HAR_PATH), exist_ok=True)
         if os.path.exists(config.HAR_PATH):
             try:
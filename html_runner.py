@@ -1,15 +1,41 @@
 import os
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 import config
-from bs4 import BeautifulSoup
+import metrics
+from item_tracker import ItemTracker
+from raw_store import RawStore
+from sandbox import _mp_context
+
+PAGE_PARAMS = ['page', 'p', 'pg', 'pagenumber', 'page_num', 'pageindex', 'currentpage']
+OFFSET_PARAMS = ['start', 'offset', 'from', 'skip']
+SIZE_PARAMS = ['sz', 'size', 'limit', 'rows', 'count', 'pagesize', 'page_size', 'per_page']
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _mine_page(html_content, url):
+    # 进程池入口，需为模块级函数以便序列化
+    return HtmlRunner._mine_html(html_content, url)
+
 
 class HtmlRunner:
     def __init__(self):
-        self.raw_dir = config.RAW_DATA_DIR
         self.har_path = config.HAR_PATH
+        self.store = RawStore()
+        self.on_page = None
+        self._local = threading.local()
 
     def _extract_from_html(self, html_content, url):
+        with metrics.stage("html_parse"):
+            return self._mine_html(html_content, url)
+
+    @staticmethod
+    def _mine_html(html_content, url):
+        from bs4 import BeautifulSoup
         extracted_data = {}
         soup = BeautifulSoup(html_content, 'html.parser')
 
@@ -68,7 +94,145 @@ class HtmlRunner:
 
         return extracted_data
 
-    def run(self, entry=None):
+    # ==================== SSR 多页抓取 (无浏览器) ====================
+    def _infer_page_pattern(self, url, page_size):
+        """根据入口 URL 推断翻页方式，返回 (描述, 第 n 个后续页面的 URL 生成函数)。"""
+        parsed = urlparse(url)
+        query = parse_qsl(parsed.query, keep_blank_values=True)
+
+        def with_param(name, value):
+            new_query = [(k, str(value) if k == name else v) for k, v in query]
+            if name not in dict(query): new_query.append((name, str(value)))
+            return urlunparse(parsed._replace(query=urlencode(new_query)))
+
+        for k, v in query:
+            if k.lower() in PAGE_PARAMS and v.isdigit():
+                return f"?{k}=N", lambda n, k=k, v=int(v): with_param(k, v + n)
+
+        for k, v in query:
+            if k.lower() in OFFSET_PARAMS and v.isdigit():
+                size = next((int(sv) for sk, sv in query if sk.lower() in SIZE_PARAMS and sv.isdigit()), page_size)
+                return f"?{k}=N*{size}", lambda n, k=k, v=int(v), size=size: with_param(k, v + n * size)
+
+        m = re.search(r'/page/(\d+)', parsed.path)
+        if m:
+            start = int(m.group(1))
+            return "/page/N", lambda n: urlunparse(parsed._replace(
+                path=parsed.path[:m.start(1)] + str(start + n) + parsed.path[m.end(1):]))
+
+        # 入口无翻页标记时按最常见的 ?page=N 试探，若服务端忽略该参数会因重复页立即停止
+        return "?page=N (默认)", lambda n: with_param('page', 1 + n)
+
+    def _replay_headers(self, entry):
+        req = entry['request']
+        headers = {h['name']: h['value'] for h in req.get('headers', [])
+                   if not h['name'].startswith(':') and h['name'].lower() not in
+                   ['content-length', 'host', 'connection', 'accept-encoding']}
+        if not any(k.lower() == 'cookie' for k in headers) and req.get('cookies'):
+            headers['Cookie'] = "; ".join(f"{c['name']}={c['value']}" for c in req['cookies'])
+        return headers
+
+    def _fetch_html(self, url, headers):
+        """返回页面 HTML；页面不存在 (404 等不可重试状态) 时返回 None。
+
+        429 / 5xx 与网络异常按指数退避重试 (优先遵循 Retry-After)，重试耗尽后抛出最后一次的错误。
+        """
+        import requests
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            if config.HTTP_CACHE:
+                import http_cache
+                http_cache.mount(session)
+
+        for attempt in range(config.SSR_FETCH_RETRIES + 1):
+            delay = config.SSR_RETRY_BACKOFF * 2 ** attempt
+            try:
+                with metrics.stage("page_fetch"):
+                    resp = session.get(url, headers=headers, timeout=config.SSR_FETCH_TIMEOUT)
+            except Exception as e:
+                error = e
+            else:
+                metrics.incr("bytes_read", len(resp.content))
+                if resp.status_code == 200: return resp.text
+                if resp.status_code not in RETRY_STATUSES: return None
+                error = requests.HTTPError(f"HTTP {resp.status_code}", response=resp)
+                retry_after = resp.headers.get('Retry-After', '')
+                if retry_after.isdigit(): delay = min(int(retry_after), config.SSR_FETCH_TIMEOUT)
+            if attempt < config.SSR_FETCH_RETRIES:
+                print(f"    [!] 请求失败 {url[:60]}: {error}，{delay}s 后重试 ({attempt + 1}/{config.SSR_FETCH_RETRIES})")
+                metrics.incr("ssr_fetch_retries")
+                time.sleep(delay)
+        raise error
+
+    def _crawl_pages(self, entry, first_data):
+        """并发抓取后续 SSR 页面，直到提取出的商品为空，或全部 / 大部分已出现过。逐页 yield (url, data)。"""
+        tracker = ItemTracker()
+        _, first_count = tracker.observe(first_data)
+        if not first_count:
+            print("[*] [SSR] 首页未识别出商品列表，跳过多页抓取")
+            return
+
+        url = entry['request']['url']
+        label, page_url = self._infer_page_pattern(url, first_count)
+        headers = self._replay_headers(entry)
+        batch = config.SSR_CONCURRENCY
+        print(f"[*] [SSR] 翻页模式: {label}，并发 {batch}，最多 {config.SSR_MAX_PAGES} 页")
+
+        # 当前进程中已有抓取、采集、指标采样等线程，解析进程不能用 fork 启动 (与沙箱池相同)
+        with ProcessPoolExecutor(config.SSR_PARSE_WORKERS, mp_context=_mp_context()) as parse_pool, \
+                ThreadPoolExecutor(batch) as fetch_pool:
+            def fetch_and_parse(page_link):
+                # 返回 (错误, 数据)；页面不存在时数据为 None
+                try:
+                    html = self._fetch_html(page_link, headers)
+                except Exception as e:
+                    return e, None
+                if not html: return None, None
+                with metrics.stage("html_parse"):
+                    return None, parse_pool.submit(_mine_page, html, page_link).result()
+
+            n = 1
+            while n <= config.SSR_MAX_PAGES:
+                links = [page_url(k) for k in range(n, min(n + batch, config.SSR_MAX_PAGES + 1))]
+                for link, (error, data) in zip(links, fetch_pool.map(fetch_and_parse, links)):
+                    if error is not None:
+                        print(f"    [!] {link[:80]} 多次重试仍失败，停止翻页: {error}")
+                        metrics.incr("ssr_fetch_failures")
+                        return
+                    before = tracker.added
+                    status = tracker.classify(data) if data else "empty"
+                    if status == "empty":
+                        print(f"    [x] {link[:80]} 无商品，停止翻页")
+                        return
+                    if status == "repeat":
+                        print(f"    [x] {link[:80]} 商品重复，停止翻页")
+                        return
+                    print(f"    [+] {link[:80]} | 新增商品: {tracker.added - before}")
+                    yield link, data
+                    if status == "overlap":
+                        print(f"    [x] {link[:80]} 商品大部分已出现过，停止翻页")
+                        return
+                n += batch
+
+        print(f"[!] [SSR] 已达最大页数 {config.SSR_MAX_PAGES}")
+
+    def _save_page(self, url, data):
+        # 构造一个统一的 JSON 结构
+        wrapper = {
+            "source_url": url,
+            "extraction_type": "html_mining",
+            "data": data  # 这里面包含了 next_js, json_ld, shopify 等 key
+        }
+
+        page = self.store.append(wrapper, url)
+        entry = self.store.index()[page - 1]
+        print(f"    [√] 数据已提取并保存: 第 {page} 页 ({entry['size']} -> {entry['length']} bytes)")
+        if self.on_page: self.on_page(wrapper, None)
+
+    def run(self, entry=None, crawl=None, on_page=None):
+        """on_page: 可选回调，每保存一页立即以 (该页数据, None) 调用 (供下游并行解析)。"""
+        self.on_page = on_page
         print("==================================================")
         print("[*] [HtmlRunner] 启动全能 HTML 数据挖掘")
         print("==================================================")
@@ -82,7 +246,8 @@ class HtmlRunner:
         else:
             print(f"[*] 扫描 HAR 文件: {self.har_path}")
             try:
-                with open(self.har_path, 'r', encoding='utf-8', errors='ignore') as f:
+                with metrics.stage("har_load"), open(self.har_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    metrics.incr("bytes_read", os.path.getsize(self.har_path))
                     har = json.load(f)
                     all_entries = har['log']['entries']
                     # 过滤出可能是页面的 HTML (大于 50KB)
@@ -98,11 +263,7 @@ class HtmlRunner:
         print(f"[*] 待分析 HTML 页面数: {len(targets)}")
 
         # 2. 准备输出目录
-        if os.path.exists(self.raw_dir):
-            for f in os.listdir(self.raw_dir):
-                if f.endswith('.json'): os.remove(os.path.join(self.raw_dir, f))
-        else:
-            os.makedirs(self.raw_dir, exist_ok=True)
+        self.store.reset()
 
         # 3. 执行挖掘
         saved_count = 0
@@ -118,26 +279,20 @@ class HtmlRunner:
             data = self._extract_from_html(content, url)
 
             if data:
-                # 构造一个统一的 JSON 结构
-                wrapper = {
-                    "source_url": url,
-                    "extraction_type": "html_mining",
-                    "data": data  # 这里面包含了 next_js, json_ld, shopify 等 key
-                }
-
-                filename = f"page_{saved_count + 1}.json"
-                save_path = os.path.join(self.raw_dir, filename)
-
-                with open(save_path, 'w', encoding='utf-8') as f:
-                    json.dump(wrapper, f, ensure_ascii=False, indent=2)
-
-                print(f"    [√] 数据已提取并保存: {filename} ({len(json.dumps(wrapper))} bytes)")
                 saved_count += 1
+                self._save_page(url, data)
             else:
                 print("    [x] 未发现结构化数据")
+                continue
+
+            # 4. 单一目标: 推断翻页规则并直接通过 HTTP 抓取后续 SSR 页面
+            if entry and (config.SSR_CRAWL if crawl is None else crawl):
+                for page_link, page_data in self._crawl_pages(entry, data):
+                    saved_count += 1
+                    self._save_page(page_link, page_data)
 
         print("-" * 50)
-        print(f"[*] 挖掘结束，共生成 {saved_count} 个数据文件。")
+        print(f"[*] 挖掘结束，共保存 {saved_count} 页数据。")
         if saved_count > 0:
             return True
         return False
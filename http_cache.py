@@ -0,0 +1,193 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import requests
+from requests.adapters import HTTPAdapter
+import config
+import metrics
+
+VALIDATOR_HEADERS = ('if-none-match', 'if-modified-since')
+
+
+class HttpCache:
+    """按项目持久化的 HTTP 条件请求缓存。
+
+    index.db 记录每个 GET URL 的 ETag / Last-Modified、响应体哈希与大小，响应体按哈希压缩存放在 bodies/ 下。
+    统计计数也写入 index.db，沙箱子进程、队列 worker 中的请求都会计入同一份统计。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        content_type TEXT,
+        body_hash TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        stored REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    """
+
+    def __init__(self, root=None):
+        self.root = root or config.HTTP_CACHE_DIR
+        self.body_dir = os.path.join(self.root, "bodies")
+        self._local = threading.local()
+        os.makedirs(self.body_dir, exist_ok=True)
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30,
+                                                      isolation_level=None)
+        return conn
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.body_dir, body_hash[:2], body_hash)
+
+    # ---------- 缓存条目 ----------
+    def lookup(self, url):
+        row = self._conn().execute("SELECT etag, last_modified, content_type, body_hash, size FROM entries WHERE url = ?",
+                                   (url,)).fetchone()
+        if row is None: return None
+        return dict(zip(("etag", "last_modified", "content_type", "body_hash", "size"), row))
+
+    def validators(self, entry):
+        headers = {}
+        if entry.get("etag"): headers['If-None-Match'] = entry["etag"]
+        if entry.get("last_modified"): headers['If-Modified-Since'] = entry["last_modified"]
+        return headers
+
+    def load_body(self, entry):
+        try:
+            with open(self._body_path(entry["body_hash"]), 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def store(self, url, headers, body):
+        """保存 200 响应，返回内容是否与上次相同 (按响应体哈希比较，不依赖服务端校验头)。"""
+        body_hash = hashlib.sha1(body).hexdigest()
+        previous = self.lookup(url)
+        path = self._body_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp, path)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (url, etag, last_modified, content_type, body_hash, size, stored) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, headers.get('ETag'), headers.get('Last-Modified'), headers.get('Content-Type'),
+             body_hash, len(body), time.time()))
+        if previous and previous["body_hash"] != body_hash: self._drop_body(previous["body_hash"])
+        return bool(previous) and previous["body_hash"] == body_hash
+
+    def _drop_body(self, body_hash):
+        # 响应体按内容共享，仅在没有其他 URL 引用时删除
+        (refs,) = self._conn().execute("SELECT COUNT(*) FROM entries WHERE body_hash = ?", (body_hash,)).fetchone()
+        if not refs:
+            try:
+                os.remove(self._body_path(body_hash))
+            except OSError:
+                pass
+
+    # ---------- 统计 ----------
+    def count(self, **deltas):
+        conn = self._conn()
+        for name, value in deltas.items():
+            if not value: continue
+            conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, int(value)))
+
+    def reset_stats(self):
+        self._conn().execute("DELETE FROM counters")
+
+    def stats(self):
+        counts = dict(self._conn().execute("SELECT name, value FROM counters").fetchall())
+        stats = {k: counts.get(k, 0) for k in ("requests", "revalidated", "unchanged", "bytes_saved")}
+        stats["hit_ratio"] = round(stats["revalidated"] / stats["requests"], 4) if stats["requests"] else 0.0
+        return stats
+
+    def report(self):
+        """打印本次运行的缓存命中情况并写入 metrics。"""
+        stats = self.stats()
+        if not stats["requests"]: return stats
+        print(f"[*] [HttpCache] 请求 {stats['requests']} | 304 命中 {stats['revalidated']} ({stats['hit_ratio']:.0%}) | "
+              f"内容未变 {stats['unchanged']} | 节省 {stats['bytes_saved'] / 1024:.1f} KB")
+        metrics.incr("http_cache_requests", stats["requests"])
+        metrics.incr("http_cache_revalidated", stats["revalidated"])
+        metrics.incr("http_cache_unchanged", stats["unchanged"])
+        metrics.incr("http_cache_bytes_saved", stats["bytes_saved"])
+        return stats
+
+
+class CachingAdapter(HTTPAdapter):
+    """挂载到 requests.Session 上的传输层缓存: GET 请求自动附带上次的校验头，304 时用本地副本还原为 200 响应。
+
+    响应头 X-Cache 标记来源: REVALIDATED (304, 未传输响应体) / UNCHANGED (200, 内容与上次相同) / MISS。
+    """
+
+    def __init__(self, cache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        # 调用方自带校验头或非 GET 请求不介入
+        if request.method != 'GET' or any(h.lower() in VALIDATOR_HEADERS for h in request.headers):
+            return super().send(request, **kwargs)
+
+        entry = self.cache.lookup(request.url)
+        if entry: request.headers.update(self.cache.validators(entry))
+        resp = super().send(request, **kwargs)
+
+        if resp.status_code == 304 and entry:
+            body = self.cache.load_body(entry)
+            if body is not None:
+                resp.status_code, resp.reason = 200, "OK"
+                resp._content = body
+                resp.headers.pop('Content-Encoding', None)
+                if entry["content_type"]: resp.headers['Content-Type'] = entry["content_type"]
+                resp.headers['X-Cache'] = "REVALIDATED"
+                self.cache.count(requests=1, revalidated=1, bytes_saved=entry["size"])
+                return resp
+            # 本地副本丢失: 去掉校验头重新完整请求
+            for h in ('If-None-Match', 'If-Modified-Since'):
+                request.headers.pop(h, None)
+            resp = super().send(request, **kwargs)
+
+        if resp.status_code == 200:
+            unchanged = self.cache.store(request.url, resp.headers, resp.content)
+            resp.headers['X-Cache'] = "UNCHANGED" if unchanged else "MISS"
+            self.cache.count(requests=1, unchanged=unchanged)
+        return resp
+
+
+def mount(session, cache=None):
+    """为 session 的 http / https 请求挂载缓存。"""
+    adapter = CachingAdapter(cache or HttpCache())
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def cached_session(cache=None):
+    return mount(requests.Session(), cache)
+
+
+def install(root=None):
+    """在当前进程中让所有新建的 requests.Session (含 requests.get 等) 使用缓存，供执行生成代码的沙箱进程调用。"""
+    cache = HttpCache(root)
+
+    class CachedSession(requests.Session):
+        def __init__(self):
+            super().__init__()
+            mount(self, cache)
+
+    requests.Session = requests.sessions.Session = CachedSession
+    return cache
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import math
+import threading
+import config
+
+# 只用真正的 id / sku 字段作身份: 同名的不同颜色、尺码按 name 或 url 会被误判为同一商品
+ID_KEYS = ['id', 'sku', 'productId', 'product_id', '@id']
+BUSINESS_KEYWORDS = ['price', 'article', 'sku', 'product', 'name', 'color', 'brand', 'item']
+# 解析后行的 SKU 列，按列名精确匹配 (忽略大小写)；variant_sku 粒度最细，优先
+SKU_KEYS = ['variant_sku', 'sku', 'sku_id', 'skuid', 'sku_code', 'product_sku', 'item_sku']
+_MASK64 = (1 << 64) - 1
+
+
+def _dict_lists(data):
+    """遍历 JSON 树，返回 {结构路径: 字典元素}；同一结构位置 (如 root.groups[*].products) 的各实例合并。"""
+    lists = {}
+    stack = [(data, "root")]
+    while stack:
+        cur, path = stack.pop()
+        if isinstance(cur, dict):
+            stack.extend((v, f"{path}.{k}") for k, v in cur.items() if isinstance(v, (dict, list)))
+        elif isinstance(cur, list):
+            dicts = [x for x in cur if isinstance(x, dict)]
+            if dicts: lists.setdefault(path, []).extend(dicts)
+            stack.extend((x, f"{path}[*]") for x in reversed(cur) if isinstance(x, (dict, list)))
+    return lists
+
+
+def _business_score(items):
+    # 与 DataProcessor._analyze_json_vitals 的权重一致: 长度 + 商品类字段命中，过短的列表降权
+    keys = set()
+    for item in items:
+        keys.update(map(str, item))
+        for v in item.values():
+            if isinstance(v, dict): keys.update(map(str, v))
+    score = len(items)
+    if any(k in " ".join(keys).lower() for k in BUSINESS_KEYWORDS): score += 1000
+    if len(items) < 5: score -= 500
+    return score
+
+
+def _content_key(obj):
+    return hashlib.md5(json.dumps(obj, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def item_key(item):
+    """商品的身份键: id / sku 字段，缺失时为整个商品的内容哈希。"""
+    key = next((k for k in ID_KEYS if isinstance(item.get(k), (str, int))), None)
+    return f"{key}={item[key]}" if key else _content_key(item)
+
+
+def row_key(row):
+    """解析后 SKU 行的身份键: 按 SKU_KEYS 顺序取第一个非空的 SKU 列，没有时为整行内容 (与 DataFrame 整行去重一致)。"""
+    lowered = {str(k).lower(): k for k in row}
+    for name in SKU_KEYS:
+        value = row.get(lowered.get(name))
+        if value is not None and str(value).strip(): return f"{name}={value}"
+    return _content_key(row)
+
+
+def _digest(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _mix(h):
+    # splitmix64: 由一个 64 位哈希派生第二个独立哈希 (双重哈希)
+    h = (h + 0x9E3779B97F4A7C15) & _MASK64
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return h ^ (h >> 31)
+
+
+class BloomFilter:
+    """按容量与误判率定长分配的 Bloom 过滤器，位置由双重哈希 h1 + i * h2 生成。"""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, h1):
+        """加入 64 位哈希，返回此前是否 (可能) 已存在。"""
+        h2 = _mix(h1) | 1
+        present = True
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.size
+            byte, bit = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte] & bit:
+                present = False
+                self.bits[byte] |= bit
+        return present
+
+
+class ItemTracker:
+    """流式的商品身份去重器，翻页引擎与 Processor 共用。
+
+    翻页判定: 前 exact_limit 个商品身份以 64 位哈希精确保存；超过后转为 Bloom 过滤器，内存固定
+    (默认 1000 万容量、0.1% 误判约 18MB)。Bloom 模式下只会把极少量新商品误判为重复，提前一页停止翻页。
+    入库去重 (filter_rows) 始终精确，不会因误判丢行。
+    """
+
+    def __init__(self, capacity=None, error_rate=None, exact_limit=None):
+        self.capacity = capacity or config.ITEM_TRACKER_CAPACITY
+        self.error_rate = error_rate or config.ITEM_TRACKER_ERROR_RATE
+        self.exact_limit = exact_limit if exact_limit is not None else config.ITEM_TRACKER_EXACT_LIMIT
+        self._exact = set()
+        self._bloom = None
+        self._rows = set()
+        self._lock = threading.Lock()
+        self._lists = {}
+        self._product_path = None
+        self.added = 0
+
+    def add(self, key):
+        """记录一个身份键，返回是否为新出现。"""
+        h = _digest(key)
+        with self._lock:
+            if self._bloom is not None:
+                new = not self._bloom.add(h)
+            else:
+                new = h not in self._exact
+                if new:
+                    self._exact.add(h)
+                    if len(self._exact) > self.exact_limit: self._to_bloom()
+            if new: self.added += 1
+            return new
+
+    def _to_bloom(self):
+        print(f"[*] [ItemTracker] 已记录 {len(self._exact)} 个商品，切换为 Bloom 过滤器 "
+              f"(容量 {self.capacity}，误判率 {self.error_rate})")
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        for h in self._exact:
+            self._bloom.add(h)
+        self._exact = set()
+
+    def page_items(self, data):
+        """定位一页的商品列表。
+
+        每页的 facet、导航等列表通常与上一页完全相同，不参与选择；其余列表中取业务权重最高的一个。
+        从第二页起确定的位置在之后的页面沿用，该位置没有元素即视为空页。
+        """
+        lists = _dict_lists(data)
+        hashes = {path: _content_key(items) for path, items in lists.items()}
+        with self._lock:
+            previous, self._lists = self._lists, hashes
+            if self._product_path is not None:
+                return lists.get(self._product_path, [])
+            changed = {p: items for p, items in lists.items() if previous.get(p) != hashes[p]}
+            # 所有列表都与上一页相同 (整页重复) 时仍按权重取，由身份比对判定为重复
+            candidates = changed or lists
+            path = max(candidates, key=lambda p: _business_score(candidates[p]), default=None)
+            if previous and path in changed: self._product_path = path
+            return lists.get(path, [])
+
+    def observe(self, data):
+        """记录一页中的全部商品，返回 (新商品数, 商品总数)。"""
+        keys = [item_key(item) for item in self.page_items(data)]
+        return sum(self.add(k) for k in keys), len(keys)
+
+    def classify(self, data, ratio=None):
+        """记录一页商品并判定翻页状态:
+        empty 未识别出商品 / repeat 全部已出现 (不保存，停止) / overlap 已出现占比 >= ratio (保存后停止) / new。
+        """
+        new, total = self.observe(data)
+        ratio = config.PAGINATION_SEEN_RATIO if ratio is None else ratio
+        if not total: return "empty"
+        if not new: return "repeat"
+        return "overlap" if (total - new) / total >= ratio else "new"
+
+    def filter_rows(self, rows):
+        """精确的入库去重: 丢弃 SKU 在之前批次中出现过的行；同一批内 SKU 相同的行 (如同款不同尺码) 保留。"""
+        keys = [_digest(row_key(row)) for row in rows]
+        with self._lock:
+            kept = [row for row, h in zip(rows, keys) if h not in self._rows]
+            self._rows.update(keys)
+        return kept
@@ -0,0 +1,137 @@
+import queue
+import re
+import threading
+import time
+from types import SimpleNamespace
+import config
+import metrics
+
+CODE_FENCE = re.compile(r'```python\s*(.*?)\s*```', re.DOTALL)
+
+
+class LLMClient:
+    """代码生成专用的 LLM 调用封装。
+
+    - 流式接收，```python``` 代码块闭合后立即截取并关闭连接，不等待剩余输出
+    - 主模型超过 hedge_delay 秒仍未给出有效代码时，向备用 (更快的) 模型发送同一 prompt，取先到的有效结果
+    - 每次调用的延迟与 token 用量记录到 metrics
+    """
+
+    def __init__(self, model=None, fallback_model=None, hedge_delay=None, timeout=None, client=None):
+        self.model = model or config.LLM_MODEL
+        self.fallback_model = fallback_model if fallback_model is not None else config.LLM_FALLBACK_MODEL
+        self.hedge_delay = hedge_delay if hedge_delay is not None else config.LLM_HEDGE_DELAY
+        self.timeout = timeout or config.LLM_TIMEOUT
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL, timeout=self.timeout)
+        return self._client
+
+    def _valid(self, code, require):
+        if not code: return False
+        if require and not re.search(rf'def\s+{require}\s*\(', code): return False
+        try:
+            compile(code, '<llm>', 'exec')
+            return True
+        except SyntaxError:
+            return False
+
+    def _stream_code(self, model, prompt, cancel, require):
+        start = time.perf_counter()
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            stream=True,
+            # 请求服务端在最后一个分片中返回 usage (完整读完流时才有)
+            stream_options={"include_usage": True},
+        )
+        text, code, usage, chunks = "", None, None, 0
+        try:
+            for chunk in stream:
+                if cancel.is_set(): break
+                if getattr(chunk, 'usage', None): usage = chunk.usage
+                if not chunk.choices: continue
+                delta = chunk.choices[0].delta
+                # 推理模型 (如 deepseek-reasoner) 先输出 reasoning_content，同样计入输出 token 估算
+                if getattr(delta, 'reasoning_content', None): chunks += 1
+                content = delta.content
+                if not content: continue
+                text += content
+                chunks += 1
+                # 代码块闭合即可返回，剩余的解释性输出不再等待
+                if '```' in content or text.count('```') >= 2:
+                    m = CODE_FENCE.search(text)
+                    if m:
+                        code = m.group(1)
+                        break
+        finally:
+            close = getattr(stream, 'close', None)
+            if close: close()
+
+        if code is None and not cancel.is_set():
+            m = CODE_FENCE.search(text)
+            code = m.group(1) if m else text.strip()
+
+        latency = time.perf_counter() - start
+        # 提前断开时服务端不会返回 usage，按流式分片数估算输出 token
+        metrics.record_llm(model, latency, usage or SimpleNamespace(prompt_tokens=0, completion_tokens=chunks))
+        print(f"    -> [LLM] {model} 返回 {len(code or '')} 字符代码，耗时 {latency:.1f}s")
+        return code
+
+    def generate_code(self, prompt, require=None):
+        """返回 prompt 对应的 python 代码块；require 为必须包含的函数名。全部失败或超时返回 None。"""
+        results = queue.Queue()
+        cancel = threading.Event()
+
+        def attempt(model):
+            try:
+                results.put((model, self._stream_code(model, prompt, cancel, require)))
+            except Exception as e:
+                print(f"    [!] [LLM] {model} 调用失败: {e}")
+                results.put((model, None))
+
+        def launch(model):
+            threading.Thread(target=attempt, args=(model,), name=f"llm-{model}", daemon=True).start()
+
+        can_hedge = bool(self.fallback_model) and self.fallback_model != self.model
+        start = time.monotonic()
+        deadline = start + self.timeout
+        hedge_at = start + self.hedge_delay
+        launch(self.model)
+        running, hedged = 1, False
+
+        with metrics.stage("llm_call"):
+            while running:
+                now = time.monotonic()
+                if now >= deadline: break
+                wait_until = deadline if hedged or not can_hedge else min(deadline, hedge_at)
+                try:
+                    model, code = results.get(timeout=max(0.0, wait_until - now))
+                except queue.Empty:
+                    if can_hedge and not hedged and time.monotonic() >= hedge_at:
+                        print(f"[*] [LLM] {self.model} 超过 {self.hedge_delay}s 未完成，对冲请求 {self.fallback_model}")
+                        launch(self.fallback_model)
+                        running, hedged = running + 1, True
+                        metrics.incr("llm_hedged")
+                    continue
+
+                running -= 1
+                if self._valid(code, require):
+                    cancel.set()
+                    if model != self.model: metrics.incr("llm_fallback_wins")
+                    return code
+                print(f"    [!] [LLM] {model} 未返回有效代码")
+                # 主模型提前失败时不必等到对冲时间
+                if can_hedge and not hedged:
+                    launch(self.fallback_model)
+                    running, hedged = running + 1, True
+                    metrics.incr("llm_hedged")
+
+        cancel.set()
+        print(f"[!] [LLM] 代码生成失败 (超时 {self.timeout}s 或无有效结果)")
+        return None
@@ -1,40 +1,201 @@
-import json
-import os
+import argparse
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import config
-from har_recorder import HarRecorder
-from strategy_selector import StrategySelector
-from api_runner import ApiRunner
-from html_runner import HtmlRunner
-from processor import DataProcessor
+import metrics
 
+STAGES = ("all", "record", "select", "collect", "process", "enqueue", "worker", "export")
 
-def main():
-    print("=== AUTO CRAWLER AI EDITION STARTED ===")
 
-    HarRecorder().run()
+# 各阶段按需导入依赖 (playwright / bs4 / openai / pandas)，单独运行某一阶段时不加载其余模块
+def stage_record():
+    from har_recorder import HarRecorder
+    with metrics.stage("record"):
+        HarRecorder().run()
+
 
-    selector = StrategySelector()
-    if not selector.load_har(): return
-    strategy = selector.select()
+def stage_select():
+    from strategy_selector import StrategySelector
+    with metrics.stage("select"):
+        strategy = StrategySelector().select()
 
     if not strategy:
         print("[!] 无法确定抓取策略，程序终止")
-        return
+    return strategy
+
+
+def stage_collect(strategy=None, on_page=None):
+    if strategy is None:
+        strategy = stage_select()
+        if not strategy: return False
+
+    cache = None
+    if config.HTTP_CACHE:
+        from http_cache import HttpCache
+        cache = HttpCache()
+        cache.reset_stats()
 
     success = False
-    if strategy['mode'] == "API":
-        success = ApiRunner().run(strategy['data'])
-    elif "HTML" in strategy['mode']:
-        success = HtmlRunner().run(entry=strategy['data'])
+    with metrics.stage("collect"):
+        if strategy['mode'] == "API":
+            from api_runner import ApiRunner
+            success = ApiRunner().run(strategy['data'], on_page=on_page)
+        elif "HTML" in strategy['mode']:
+            from html_runner import HtmlRunner
+            success = HtmlRunner().run(entry=strategy['data'], on_page=on_page)
+    if cache: cache.report()
 
     if not success:
         print("[!] 采集阶段未获得有效数据，程序终止")
-        return
-    print(f"[*] [Main] 采集完成，准备启动 AI 处理...")
+    return success
+
+
+def stage_process():
+    from processor import DataProcessor
+    with metrics.stage("process"):
+        DataProcessor().run()
+
+
+# 分布式抓取: enqueue 在协调节点运行一次，worker 可在多个节点并行运行，全部完成后运行 export
+def stage_enqueue():
+    strategy = stage_select()
+    if not strategy: return False
+    from queue_worker import enqueue_target
+    with metrics.stage("enqueue"):
+        return enqueue_target(strategy)
+
+
+def stage_worker():
+    from queue_worker import QueueWorker
+    with metrics.stage("worker"):
+        QueueWorker().run()
+
+
+def stage_export():
+    from queue_worker import export_results
+    with metrics.stage("export"):
+        export_results()
+
+
+def main(stage="all"):
+    if stage not in STAGES:
+        raise ValueError(f"未知阶段: {stage}，可选: {', '.join(STAGES)}")
+    print("=== AUTO CRAWLER AI EDITION STARTED ===")
+    metrics.new_run()
+    try:
+        if stage == "record":
+            stage_record()
+        elif stage == "select":
+            stage_select()
+        elif stage == "collect":
+            stage_collect()
+        elif stage == "process":
+            stage_process()
+        elif stage == "enqueue":
+            stage_enqueue()
+        elif stage == "worker":
+            stage_worker()
+        elif stage == "export":
+            stage_export()
+        elif stage == "all":
+            _run_pipeline()
+    finally:
+        metrics.dump()
 
 
-    DataProcessor().run()
+def _run_pipeline():
+    stage_record()
+
+    strategy = stage_select()
+    if not strategy: return
+
+    from processor import DataProcessor
+    processor = DataProcessor()
+
+    # 采集与处理并行: 采集线程每保存一页即放入队列；首页到达后立即并行生成解析器，
+    # 解析器就绪后逐批解析后续到达的页面。总耗时约为 max(采集, LLM) 而非两者之和。
+    pages = queue.Queue()
+    done = object()
+    result = {}
+
+    def collect():
+        try:
+            result['success'] = stage_collect(strategy, on_page=lambda page, shard: pages.put((page, shard)))
+        except Exception as e:
+            print(f"[!] 采集阶段异常: {e}")
+        finally:
+            pages.put(done)
+
+    collector = threading.Thread(target=collect, name="collect", daemon=True)
+    collector.start()
+
+    parser_future = None
+    parser_code = None
+    pending, rows = [], []
+    parsed = 0
+    finished = False
+
+    with metrics.stage("process"), ThreadPoolExecutor(max_workers=1, thread_name_prefix="parser") as llm:
+        while not finished:
+            try:
+                batch = [pages.get(timeout=0.5)]
+                # 一次取走已到达的所有页面，合并为一次沙箱调用
+                while True:
+                    try:
+                        batch.append(pages.get_nowait())
+                    except queue.Empty:
+                        break
+            except queue.Empty:
+                batch = []
+
+            if done in batch:
+                finished = True
+                batch.remove(done)
+            pending.extend(batch)
+
+            if parser_future is None and pending:
+                print("[*] [Main] 首页已到达，并行生成解析器...")
+                parser_future = llm.submit(processor.generate_parser, pending[0][0])
+
+            if parser_future is not None and (parser_future.done() or finished):
+                try:
+                    parser_code = parser_future.result()
+                except Exception as e:
+                    print(f"[!] 解析器生成失败: {e}")
+                    break
+                if pending:
+                    try:
+                        batch_pages, batch_shards = zip(*pending)
+                        rows.extend(processor.parse_pages(parser_code, list(batch_pages), parsed, batch_shards))
+                    except Exception as e:
+                        print(f"[!] 解析出错: {e}")
+                        print(f"--- 生成代码预览 ---\n{parser_code}\n-------------------")
+                    parsed += len(pending)
+                    pending = []
+
+        collector.join()
+        if not result.get('success'): return
+        if parser_code is None: return
+        print(f"[*] [Main] 采集完成，共解析 {parsed} 页")
+
+        processor.export(rows)
     print("=== TASK COMPLETED ===")
 
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="AUTO CRAWLER AI EDITION")
+    parser.add_argument("--stage", choices=STAGES, default="all",
+                        help="只运行单个阶段: record / select / collect (含 select) / process；"
+                             "分布式抓取: enqueue / worker / export")
+    parser.add_argument("--url", help="覆盖 config.TARGET_URL")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        config.TARGET_URL = args.url
+        config.settings.override()
+    main(args.stage)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
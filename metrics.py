@@ -0,0 +1,200 @@
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _current_rss():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # 退化为进程历史峰值 (Linux 单位 KB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+class Metrics:
+    """单次运行的阶段计时、峰值 RSS 采样与计数器，结束时写出 JSON 指标文件。"""
+
+    def __init__(self, run_id=None):
+        # 同一秒内启动的多个进程 (如多个队列 worker 共用存储) 靠主机名与 pid 区分，避免覆盖彼此的指标文件
+        self.run_id = run_id or f"{time.strftime('%Y%m%d_%H%M%S')}_{socket.gethostname()}_{os.getpid()}"
+        self.started_at = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.llm_calls = []
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = {}
+        self._sampler = None
+        self._stop = threading.Event()
+
+    # ---------- RSS 采样 ----------
+    def _ensure_sampler(self):
+        if self._sampler is not None: return
+        self._sampler = threading.Thread(target=self._sample_loop, name="metrics-rss", daemon=True)
+        self._sampler.start()
+
+    def _sample_loop(self):
+        while not self._stop.wait(config.METRICS_SAMPLE_INTERVAL):
+            self._sample()
+
+    def _sample(self):
+        rss = _current_rss()
+        with self._lock:
+            for token, peak in self._active.items():
+                if rss > peak: self._active[token] = rss
+        return rss
+
+    # ---------- 阶段计时 ----------
+    @contextmanager
+    def stage(self, name):
+        stack = getattr(self._local, "stack", None)
+        if stack is None: stack = self._local.stack = []
+        full_name = "/".join(stack + [name])
+        stack.append(name)
+
+        token = object()
+        with self._lock:
+            self._active[token] = 0
+        self._ensure_sampler()
+        self._sample()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._sample()
+            stack.pop()
+            with self._lock:
+                peak = self._active.pop(token)
+                st = self.stages.setdefault(full_name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                        "peak_rss_mb": 0.0})
+                st["count"] += 1
+                st["seconds"] += elapsed
+                st["max_seconds"] = max(st["max_seconds"], elapsed)
+                st["peak_rss_mb"] = max(st["peak_rss_mb"], peak / (1024 * 1024))
+
+    # ---------- 计数器 ----------
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_llm(self, model, latency, usage=None):
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        with self._lock:
+            self.llm_calls.append({"model": model, "latency": round(latency, 3),
+                                   "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        self.incr("llm_calls")
+        self.incr("llm_prompt_tokens", prompt_tokens)
+        self.incr("llm_completion_tokens", completion_tokens)
+        self.incr("llm_latency_seconds", latency)
+
+    # ---------- 导出 ----------
+    def to_dict(self):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "project": config.PROJECT_NAME,
+                "started_at": self.started_at,
+                "wall_seconds": round(time.time() - self.started_at, 3),
+                "stages": {k: dict(v, seconds=round(v["seconds"], 4), max_seconds=round(v["max_seconds"], 4),
+                                   peak_rss_mb=round(v["peak_rss_mb"], 1)) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+                "llm_calls": list(self.llm_calls),
+            }
+
+    def _flat_metrics(self, data):
+        out = {}
+        for name, st in data["stages"].items():
+            key = name.replace("/", "_")
+            out[f"stage_{key}_seconds"] = st["seconds"]
+            out[f"stage_{key}_count"] = st["count"]
+            out[f"stage_{key}_peak_rss_mb"] = st["peak_rss_mb"]
+        for name, value in data["counters"].items():
+            out[name] = value
+        out["wall_seconds"] = data["wall_seconds"]
+        return out
+
+    def export_prometheus(self, path, data):
+        lines = []
+        for name, value in self._flat_metrics(data).items():
+            lines.append(f'crawler_{name}{{project="{data["project"]}"}} {value}')
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def export_statsd(self, addr, data):
+        host, _, port = addr.rpartition(":")
+        prefix = f"crawler.{data['project']}"
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for name, value in self._flat_metrics(data).items():
+                sock.sendto(f"{prefix}.{name}:{value}|g".encode("utf-8"), (host or "127.0.0.1", int(port)))
+        finally:
+            sock.close()
+
+    def dump(self):
+        self._stop.set()
+        data = self.to_dict()
+        os.makedirs(config.METRICS_DIR, exist_ok=True)
+        path = os.path.join(config.METRICS_DIR, f"run_{self.run_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"[*] [Metrics] 运行指标已写入: {path}")
+
+        try:
+            if config.METRICS_PROMETHEUS_FILE:
+                self.export_prometheus(config.METRICS_PROMETHEUS_FILE, data)
+            if config.METRICS_STATSD_ADDR:
+                self.export_statsd(config.METRICS_STATSD_ADDR, data)
+        except Exception as e:
+            print(f"[!] [Metrics] 指标导出失败: {e}")
+        return path
+
+
+_current = Metrics()
+
+
+def new_run(run_id=None):
+    global _current
+    _current = Metrics(run_id)
+    return _current
+
+
+def current():
+    return _current
+
+
+def stage(name):
+    return _current.stage(name)
+
+
+def incr(name, value=1):
+    _current.incr(name, value)
+
+
+def record_llm(model, latency, usage=None):
+    _current.record_llm(model, latency, usage)
+
+
+def dump():
+    return _current.dump()
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import shutil
+import config
+from raw_store import RawStore
+
+PARSER_FILE = "parser.json"
+PENDING_PARSER_FILE = "parser.pending.json"
+
+
+def page_hash(page):
+    return hashlib.sha1(json.dumps(page, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+class ParseCache:
+    """LLM 解析器与逐页解析结果的跨运行缓存，用于每日重跑时跳过内容未变的页面。
+
+    - 解析器按样本页结构签名 (路径 + 字段) 保存，结构不变时直接复用，不再调用 LLM
+    - 解析结果按 (解析器哈希, 页面内容哈希) 保存在 current/ 中；查找时同时查看上一次运行留下的 previous/
+    - commit() 在导出成功后调用: 生效本次的解析器，并将 current/ 轮转为 previous/，缓存体积不超过两次运行
+    """
+
+    def __init__(self, root=None):
+        self.root = root or config.PARSE_CACHE_DIR
+        self.current = RawStore(os.path.join(self.root, "current"))
+        self.previous = RawStore(os.path.join(self.root, "previous"))
+
+    @staticmethod
+    def signature(vitals):
+        shape = sorted((rec['path'], sorted(str(k) for k in rec['keys'])) for rec in vitals)
+        return hashlib.sha1(json.dumps(shape, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _key(parser_code, digest):
+        return f"{hashlib.sha1(parser_code.encode('utf-8')).hexdigest()[:16]}:{digest}"
+
+    # ---------- 解析器 ----------
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.root, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_parser(self, signature):
+        saved = self._read(PARSER_FILE)
+        return saved["code"] if saved and saved.get("signature") == signature else None
+
+    def stage_parser(self, signature, parser_code):
+        """记录本次新生成的解析器，导出成功 (commit) 后才会被后续运行复用。"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, PENDING_PARSER_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"signature": signature, "code": parser_code}, f, ensure_ascii=False)
+
+    # ---------- 解析结果 ----------
+    def get(self, parser_code, digest):
+        key = self._key(parser_code, digest)
+        rows = self.current.find(key)
+        if rows is None:
+            rows = self.previous.find(key)
+            # 命中上一次的结果时复制到本次，轮转后仍然保留
+            if rows is not None: self.current.append(rows, key=key)
+        return rows
+
+    def put(self, parser_code, digest, rows):
+        self.current.append(rows, key=self._key(parser_code, digest))
+
+    def commit(self):
+        pending = os.path.join(self.root, PENDING_PARSER_FILE)
+        if os.path.exists(pending):
+            os.replace(pending, os.path.join(self.root, PARSER_FILE))
+        if os.path.exists(self.current.root):
+            shutil.rmtree(self.previous.root, ignore_errors=True)
+            os.replace(self.current.root, self.previous.root)
+        self.current = RawStore(os.path.join(self.root, "current"))
+        self.previous = RawStore(os.path.join(self.root, "previous"))
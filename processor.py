@@ -1,74 +1,94 @@
 import json
-import re
 import os
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import config
-from openai import OpenAI
+import extractors
+import metrics
+from item_tracker import BUSINESS_KEYWORDS, SKU_KEYS, ItemTracker
+from llm_client import LLMClient
+from parse_cache import ParseCache, page_hash
+from raw_store import RawStore
+from sandbox import SandboxError, get_pool
 
 
 class DataProcessor:
-    def __init__(self):
-        self.client = OpenAI(api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL, timeout=180.0)
+    def __init__(self, llm=None):
+        self.llm = llm or LLMClient()
+        self._cache = None
+        # 跨批次的 SKU 去重 (流水线中 parse_pages 会被多次调用)
+        self.items = ItemTracker()
+
+    @property
+    def cache(self):
+        if self._cache is None and config.PARSE_CACHE:
+            self._cache = ParseCache()
+        return self._cache
 
     def _analyze_json_vitals(self, data):
-        report = []
+        """单次迭代遍历 JSON 树，为每个 List 节点生成结构记录。
 
-        def walk(obj, path="root", depth=0):
-            if depth > 7: return
-            if isinstance(obj, list) and len(obj) > 0:
-                report.append(f"PATH: {path} | TYPE: List | LEN: {len(obj)}")
-                if isinstance(obj[0], dict):
-                    keys_sample = list(obj[0].keys())[:15]
-                    report.append(f"  -> KEYS: {keys_sample}")
-                walk(obj[0], f"{path}[0]", depth + 1)
-            elif isinstance(obj, dict):
-                for k, v in obj.items():
-                    if isinstance(v, (dict, list)): walk(v, f"{path}.{k}", depth + 1)
-
-        walk(data)
+        同一结构位置 (如 root.products[*].variants) 的所有实例合并为一条记录:
+        path 为结构路径, node 为首个非空实例 (按路径 O(1) 取值), keys 为所有元素的键并集,
+        score 为业务权重 (长度 + 关键词命中)。无深度上限。
+        """
+        records = {}
+        stack = [(data, "root")]
+
+        while stack:
+            obj, path = stack.pop()
+            if isinstance(obj, dict):
+                children = [(v, f"{path}.{k}") for k, v in obj.items() if isinstance(v, (dict, list))]
+            elif isinstance(obj, list) and obj:
+                rec = records.get(path)
+                if rec is None:
+                    rec = records[path] = {"path": path, "len": len(obj), "instances": 0, "node": obj,
+                                           "keys": {}, "deep_keys": set()}
+                rec["instances"] += 1
+
+                child_path = f"{path}[*]"
+                children = []
+                for item in obj:
+                    if isinstance(item, dict):
+                        rec["keys"].update(dict.fromkeys(item))
+                        for v in item.values():
+                            if isinstance(v, dict): rec["deep_keys"].update(v)
+                    if isinstance(item, (dict, list)):
+                        children.append((item, child_path))
+            else:
+                continue
+            # 逆序压栈，保证按原始顺序访问 (首个实例即代表实例)
+            stack.extend(reversed(children))
+
+        result = []
+        for rec in records.values():
+            keys = list(rec.pop("keys"))
+            key_text = " ".join(keys + [str(k) for k in rec.pop("deep_keys")]).lower()
+            if not keys and rec["node"]:
+                # 标量 / 嵌套 List: 退化为首元素文本匹配
+                key_text = str(rec["node"][0]).lower()
+
+            score = rec["len"]
+            if any(k in key_text for k in BUSINESS_KEYWORDS): score += 1000
+            if rec["len"] < 5: score -= 500
+
+            rec.update(keys=keys, score=score)
+            result.append(rec)
+        return result
+
+    def _format_vitals(self, vitals):
+        report = []
+        for rec in vitals:
+            report.append(f"PATH: {rec['path']} | TYPE: List | LEN: {rec['len']} | INSTANCES: {rec['instances']}")
+            if rec['keys']:
+                report.append(f"  -> KEYS: {rec['keys'][:15]}")
         return "\n".join(report)
 
-    def _get_value_by_path(self, data, path):
-        parts = path.replace('root.', '').split('.')
-        curr = data
-        try:
-            for p in parts:
-                if '[' in p:
-                    name, idx = p.split('[')
-                    curr = curr.get(name) if isinstance(curr, dict) else curr
-                    if curr and isinstance(curr, list) and len(curr) > int(idx.replace(']', '')):
-                        curr = curr[int(idx.replace(']', ''))]
-                    else:
-                        return None
-                else:
-                    curr = curr.get(p) if isinstance(curr, dict) else None
-            return curr
-        except:
-            return None
-
     def _generate_parser_code(self, vitals, full_data):
-        paths = re.findall(r'PATH: (root\S+)', vitals)
-        best_path = "root"
-        max_score = -1
-
-        for p in paths:
-            val = self._get_value_by_path(full_data, p)
-            if isinstance(val, list) and len(val) > 0:
-                try:
-                    score = len(val)
-                    sample_str = str(val[0]).lower()
-                    business_keywords = ['price', 'article', 'sku', 'product', 'name', 'color', 'brand', 'item']
-                    if any(k in sample_str for k in business_keywords):
-                        score += 1000
-                    if len(val) < 5:
-                        score -= 500
-                    if score > max_score:
-                        max_score = score
-                        best_path = p
-                except:
-                    continue
-
-        target_list = self._get_value_by_path(full_data, best_path)
+        best = max(vitals, key=lambda r: r['score'], default=None)
+        best_path = best['path'] if best else "root"
+        max_score = best['score'] if best else -1
+        target_list = best['node'] if best else full_data
+
         mini_sample = {
             "target_path": best_path,
             "sample_structure": target_list[:1] if isinstance(target_list, list) else "Not Found"
@@ -79,7 +99,7 @@ class DataProcessor:
         prompt = f"""
         任务：编写 Python 函数 `parse_json(data)`。
         【结构路径综合报告】：
-        {vitals}
+        {self._format_vitals(vitals)}
         【数据样本】：
         {json.dumps(mini_sample, indent=2, ensure_ascii=False)}
 
@@ -100,13 +120,24 @@ class DataProcessor:
         6. 只输出 Python 代码，包裹在 ```python ``` 中。
         """
 
-        response = self.client.chat.completions.create(
-            model=config.LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1
-        )
-        code = re.search(r'```python\s*(.*?)\s*```', response.choices[0].message.content, re.DOTALL)
-        return code.group(1) if code else response.choices[0].message.content
+        code = self.llm.generate_code(prompt, require="parse_json")
+        if not code: raise RuntimeError("LLM 未返回有效的 parse_json 代码")
+        return code
+
+    def _dedupe_by_sku(self, df, shards):
+        """分片抓取的结果会重叠: 同一 SKU 出现在多个分片时只保留最先出现的分片中的行。
+        同一分片内 SKU 相同的行 (如不同尺码) 与 SKU 为空的行保留。"""
+        columns = {str(c).lower(): c for c in df.columns}
+        col = next((columns[name] for name in SKU_KEYS if name in columns), None)
+        if col is None: return df
+        sku = df[col].astype(str).str.strip()
+        has_sku = df[col].notna() & (sku != '')
+        shards = shards.reindex(df.index).fillna('')
+        first_shard = shards[has_sku].groupby(sku[has_sku]).transform('first')
+        keep = ~has_sku | (shards == first_shard.reindex(df.index))
+        if not keep.all():
+            print(f"    [!] 按 [{col}] 合并跨分片重复的 SKU: {len(df)} -> {keep.sum()}")
+        return df[keep].reset_index(drop=True)
 
     def run(self):
         print("==================================================")
@@ -116,77 +147,173 @@ class DataProcessor:
             print(f"[!] 目录不存在: {config.RAW_DATA_DIR}")
             return
 
-        all_pages = []
-        files = [f for f in sorted(os.listdir(config.RAW_DATA_DIR)) if f.endswith('.json')]
-
-        if not files:
-            print(f"[!] 目录 {config.RAW_DATA_DIR} 中没有找到 JSON 文件")
+        store = RawStore()
+        if not len(store):
+            print(f"[!] 目录 {config.RAW_DATA_DIR} 中没有找到原始数据")
             return
 
-        print(f"[*] 发现 {len(files)} 个数据文件，开始加载...")
-        for f_name in files:
-            try:
-                with open(os.path.join(config.RAW_DATA_DIR, f_name), 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if data: all_pages.append(data)
-            except Exception as e:
-                print(f"[!] 文件 {f_name} 加载失败: {e}")
+        print(f"[*] 发现 {len(store)} 页原始数据，开始加载...")
+        try:
+            with metrics.stage("raw_load"):
+                records = [(data, entry.get("shard")) for entry, data in store.iter_records() if data]
+                all_pages = [data for data, _ in records]
+        except Exception as e:
+            print(f"[!] 原始数据加载失败: {e}")
+            return
 
         if not all_pages: return
 
-        # 选取最大的文件作为样本，增加命中率
-        main_page = max(all_pages, key=lambda x: len(json.dumps(x)))
-        vitals = self._analyze_json_vitals(main_page)
+        # 选取最大的一页作为样本，增加命中率 (体积取自索引)
+        parser_code = None
+        try:
+            parser_code = self.generate_parser(store.largest_page())
+            final_data = self.parse_pages(parser_code, all_pages, shards=[shard for _, shard in records])
+            self.export(final_data)
+        except Exception as e:
+            print(f"[!] 执行出错: {e}")
+            print(f"--- 生成代码预览 ---\n{parser_code}\n-------------------")
+
+    def _builtin_parser(self, sample_page):
+        """样本页命中内置解析器，且页面其余数据中没有更大的商品列表时返回该解析器。"""
+        extractor = extractors.match(sample_page)
+        if extractor is None: return None
+        rows = extractor(sample_page)
+
+        if sample_page.get('extraction_type') == 'html_mining':
+            # 例如 JSON-LD 只列了部分商品而 Next.js 数据中有完整列表: 仍交给 LLM
+            rest = {k: v for k, v in sample_page['data'].items() if k not in extractor.sources}
+            rival = max(self._analyze_json_vitals(rest), key=lambda r: r['score'], default=None)
+            if rival and rival['score'] >= 1000 and rival['len'] > len(rows):
+                print(f"[*] 内置解析器 [{extractor.name}] 仅 {len(rows)} 行，[{rival['path']}] 更完整 ({rival['len']})，交由 LLM")
+                return None
+
+        print(f"[*] 命中内置解析器 [{extractor.name}] (样本页 {len(rows)} 行)，跳过 LLM")
+        metrics.incr("builtin_parser_hits")
+        return extractor
+
+    def generate_parser(self, sample_page):
+        """返回样本页适用的解析器: 优先使用内置解析器，否则分析结构并调用 LLM 生成 parse_json 代码。"""
+        builtin = self._builtin_parser(sample_page)
+        if builtin: return builtin
+
+        vitals = self._analyze_json_vitals(sample_page)
+        signature = ParseCache.signature(vitals)
+        if self.cache:
+            code = self.cache.load_parser(signature)
+            if code:
+                print("[*] 页面结构与上次运行一致，复用上次生成的解析器")
+                metrics.incr("parser_reused")
+                return code
+
+        report = self._format_vitals(vitals)
 
         print("--------------------------------------------------")
         # 截断过长的 vitals 显示，避免刷屏
-        print(vitals[:1000] + "..." if len(vitals) > 1000 else vitals)
+        print(report[:1000] + "..." if len(report) > 1000 else report)
         print("--------------------------------------------------")
 
-        parser_code = self._generate_parser_code(vitals, main_page)
-        exec_scope = {"json": json, "re": re}
+        code = self._generate_parser_code(vitals, sample_page)
+        if self.cache: self.cache.stage_parser(signature, code)
+        return code
 
+    def _run_builtin(self, extractor, page):
         try:
-            exec(parser_code, exec_scope)
-            if 'parse_json' not in exec_scope:
-                raise ValueError("生成的代码中未找到 parse_json 函数")
-
-            parse_func = exec_scope['parse_json']
-            final_data = []
-
-            for i, page in enumerate(all_pages):
-                try:
-                    items = parse_func(page)
-                    if items and isinstance(items, list):
-                        # 过滤掉非字典项和空项
-                        valid_items = [it for it in items if isinstance(it, dict) and len(it) > 2]
-                        final_data.extend(valid_items)
-                        print(f"    -> 提取进度: {i + 1}/{len(all_pages)} | 获得实体: {len(valid_items)}")
-                except Exception as e:
-                    print(f"    -> [Warn] 页面 {i + 1} 解析微小错误: {e}")
-
-            if final_data:
-                df = pd.DataFrame(final_data)
-                df.dropna(axis=1, how='all', inplace=True)
-
-                # 将复杂对象转字符串，防止去重报错
-                for col in df.columns:
-                    if df[col].apply(lambda x: isinstance(x, (list, dict))).any():
-                        df[col] = df[col].astype(str)
-
-                before_len = len(df)
-                df.drop_duplicates(inplace=True)
-                print(f"    [!] 去重操作: {before_len} -> {len(df)}")
-
-                df.to_excel(config.RESULT_EXCEL, index=False)
-                print(f"[√] 清洗完成: 最终导出 {len(df)} 条记录至 Excel")
-            else:
-                print("[!] 未能提取到任何有效数据。")
-
+            return "ok", extractor(page)
         except Exception as e:
-            print(f"[!] 执行出错: {e}")
-            print(f"--- 生成代码预览 ---\n{parser_code}\n-------------------")
+            return "error", f"{type(e).__name__}: {e}"
+
+    def _run_sandbox(self, parser_code, pages):
+        """在沙箱中执行 parse_json；内容与之前运行相同的页面直接取缓存的解析结果。
+
+        待解析页面按 PARSER_CHUNK_PAGES 分块，分散到池中各 worker 并行执行，每块单独计墙钟预算；
+        某块超时或超出限额时只有该块的页面记为失败。
+        """
+        cache = self.cache
+        digests = [page_hash(page) for page in pages] if cache else [None] * len(pages)
+        cached = [cache.get(parser_code, d) if cache else None for d in digests]
+        results = [("ok", rows) if rows is not None else None for rows in cached]
+        todo = [i for i, r in enumerate(results) if r is None]
+        if cache and len(todo) < len(pages):
+            metrics.incr("pages_parse_cached", len(pages) - len(todo))
+            print(f"    -> {len(pages) - len(todo)} 页内容未变，复用上次解析结果")
+
+        if not todo: return results
+
+        pool = get_pool()
+        size = config.PARSER_CHUNK_PAGES
+        chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+
+        def run_chunk(chunk):
+            try:
+                return pool.run(parser_code, "parse_json", [(pages[i],) for i in chunk],
+                                wall_seconds=config.PARSER_WALL_SECONDS)
+            except SandboxError as e:
+                metrics.incr("parse_chunks_failed")
+                return [("error", f"SandboxError: {e}")] * len(chunk)
+
+        with ThreadPoolExecutor(max_workers=min(pool.size, len(chunks))) as executor:
+            for chunk, fresh in zip(chunks, executor.map(run_chunk, chunks)):
+                for i, (status, value) in zip(chunk, fresh):
+                    if cache and status == "ok": cache.put(parser_code, digests[i], value)
+                    results[i] = (status, value)
+        return results
+
+    def parse_pages(self, parser, pages, start=0, shards=None, dedupe=True):
+        """对一批页面执行解析器，返回有效实体列表。内置解析器在进程内直接调用，LLM 生成的代码在沙箱中执行。
+        start 为这批页面之前已解析的页数 (仅用于日志)；shards 为各页所属分片的标签，写入行的 _shard 字段供导出时合并；
+        dedupe=False 时不做入库去重 (结果需与页面一一对应、可重复计算时使用，由导出阶段统一去重)。"""
+        with metrics.stage("page_parse"):
+            if isinstance(parser, extractors.Extractor):
+                results = [self._run_builtin(parser, page) for page in pages]
+            else:
+                results = self._run_sandbox(parser, pages)
+        metrics.incr("pages_parsed", len(results))
+        final_data = []
+
+        for i, (status, items) in enumerate(results, start + 1):
+            if status != "ok":
+                print(f"    -> [Warn] 页面 {i} 解析微小错误: {items}")
+                continue
+            if items and isinstance(items, list):
+                # 过滤掉非字典项和空项
+                valid_items = [it for it in items if isinstance(it, dict) and len(it) > 2]
+                unique_items = self.items.filter_rows(valid_items) if dedupe else valid_items
+                shard = shards[i - start - 1] if shards else None
+                if shard is not None:
+                    for row in unique_items: row['_shard'] = shard
+                final_data.extend(unique_items)
+                dropped = len(valid_items) - len(unique_items)
+                if dropped: metrics.incr("rows_deduped_at_ingest", dropped)
+                print(f"    -> 提取进度: 第 {i} 页 | 获得实体: {len(unique_items)}" + (f" (重复 {dropped})" if dropped else ""))
+        return final_data
+
+    def export(self, final_data):
+        if not final_data:
+            print("[!] 未能提取到任何有效数据。")
+            return False
+
+        import pandas as pd
+        df = pd.DataFrame(final_data)
+        shards = df.pop('_shard') if '_shard' in df.columns else None
+        df.dropna(axis=1, how='all', inplace=True)
+
+        # 将复杂对象转字符串，防止去重报错
+        for col in df.columns:
+            if df[col].apply(lambda x: isinstance(x, (list, dict))).any():
+                df[col] = df[col].astype(str)
+
+        before_len = len(df)
+        df.drop_duplicates(inplace=True)
+        if shards is not None: df = self._dedupe_by_sku(df, shards)
+        print(f"    [!] 去重操作: {before_len} -> {len(df)}")
+
+        with metrics.stage("excel_write"):
+            df.to_excel(config.RESULT_EXCEL, index=False)
+        if self.cache: self.cache.commit()
+        metrics.incr("bytes_written", os.path.getsize(config.RESULT_EXCEL))
+        print(f"[√] 清洗完成: 最终导出 {len(df)} 条记录至 Excel")
+        return True
 
 
 if __name__ == "__main__":
-    DataProcessor().run()
\ No newline at end of file
+    DataProcessor().run()
@@ -0,0 +1,169 @@
+import os
+import socket
+import time
+import config
+import extractors
+import metrics
+from item_tracker import ItemTracker
+from raw_store import RawStore
+from sandbox import get_pool
+from shard_planner import shard_label
+from work_queue import open_queue
+
+FETCH = "fetch"
+PARSE = "parse"
+
+
+def enqueue_target(strategy, queue=None):
+    """协调节点: 生成翻页脚本与解析器、规划分片，每个分片作为一个抓取任务入队。
+
+    原始分页与解析结果分别写入 RAW_DATA_DIR / PARSED_DATA_DIR，多节点部署时这两个目录需位于共享存储上。
+    """
+    if strategy['mode'] != "API":
+        print(f"[!] [Queue] 分布式抓取仅支持 API 模式，当前为 {strategy['mode']}")
+        return False
+
+    from api_runner import ApiRunner
+    from processor import DataProcessor
+
+    queue = queue or open_queue()
+    runner = ApiRunner()
+    context, script, shards = runner.plan(strategy['data'])
+    if not script:
+        print("[!] [Queue] 翻页脚本生成失败，未入队")
+        return False
+
+    queue.clear()
+    if config.HTTP_CACHE:
+        from http_cache import HttpCache
+        HttpCache().reset_stats()
+    RawStore().reset()
+    RawStore(config.PARSED_DATA_DIR).reset()
+    queue.set_meta("script", script)
+    queue.set_meta("source_url", context['url'])
+
+    # 解析器由协调节点以 HAR 中的样本响应生成一次，所有 worker 共用
+    try:
+        parser = DataProcessor().generate_parser(runner.sample_data)
+        queue.set_meta("parser", {"builtin": parser.name} if isinstance(parser, extractors.Extractor) else {"code": parser})
+    except Exception as e:
+        print(f"[!] [Queue] 解析器生成失败，worker 只抓取原始分页 (之后可运行 --stage process): {e}")
+
+    for i, shard in enumerate(shards or [{}]):
+        queue.put(FETCH, {"shard": shard}, task_id=f"{FETCH}:{i}")
+    print(f"[√] [Queue] 已入队 {len(shards or [{}])} 个抓取任务")
+    return True
+
+
+class QueueWorker:
+    """消费抓取 / 解析任务，直到队列中没有待执行或租约中的任务。可在任意多个进程、节点上同时运行。
+
+    抓取任务按 (任务 id, 页序号) 幂等写入原始存储，解析任务按页号幂等写入解析结果，
+    因此租约过期或失败重试导致的重复执行不会产生重复数据。
+    """
+
+    def __init__(self, queue=None, worker_id=None):
+        self.queue = queue or open_queue()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.store = RawStore()
+        self.parsed = RawStore(config.PARSED_DATA_DIR)
+        self._processor = None
+        self._parser = None
+
+    @property
+    def processor(self):
+        if self._processor is None:
+            from processor import DataProcessor
+            self._processor = DataProcessor()
+        return self._processor
+
+    def _parser_for_queue(self):
+        if self._parser is None:
+            spec = self.queue.get_meta("parser")
+            if spec is None: return None
+            self._parser = extractors.by_name(spec["builtin"]) if "builtin" in spec else spec["code"]
+        return self._parser
+
+    def _fetch(self, task):
+        script = self.queue.get_meta("script")
+        source_url = self.queue.get_meta("source_url")
+        has_parser = self.queue.get_meta("parser") is not None
+        shard = task.payload.get("shard")
+
+        pool = get_pool()
+        stream = pool.stream(script, "scrape", shard) if shard else pool.stream(script, "scrape")
+        tracker = ItemTracker()
+        saved = 0
+        try:
+            for seq, page in enumerate(stream, 1):
+                if not page: continue
+                status = tracker.classify(page)
+                if status == "repeat": break
+                page_no = self.store.append(page, source_url, key=f"{task.id}:{seq}", shard=shard_label(shard))
+                saved += 1
+                metrics.incr("pages_fetched")
+                if has_parser:
+                    self.queue.put(PARSE, {"page": page_no}, task_id=f"{PARSE}:{page_no}")
+                if not self.queue.renew(task):
+                    raise RuntimeError("租约已失效，任务交由其他 worker 重试")
+                if status == "overlap": break
+        finally:
+            stream.close()
+        print(f"    -> [Worker] {task.id} {shard or ''} | 分页数: {saved}")
+
+    def _parse(self, task):
+        page_no = task.payload["page"]
+        parser = self._parser_for_queue()
+        page = self.store.get(page_no)
+        shard = self.store.index()[page_no - 1].get("shard")
+        # 不做入库去重: 同一 worker 共享的去重状态会让重试或相邻页面的解析结果被误判为重复而存成空结果
+        rows = self.processor.parse_pages(parser, [page], page_no - 1, [shard], dedupe=False)
+        self.parsed.append(rows, key=f"page:{page_no}")
+
+    def run(self, kinds=(PARSE, FETCH)):
+        """解析任务优先 (尽早释放待解析页面)，队列清空后返回完成的任务数。"""
+        handlers = {FETCH: self._fetch, PARSE: self._parse}
+        print(f"[*] [Worker {self.worker_id}] 开始消费任务队列")
+        done = 0
+        while True:
+            task = self.queue.lease(kinds)
+            if task is None:
+                if not self.queue.active(): break
+                # 其他 worker 仍持有租约 (抓取中可能继续产生解析任务)
+                time.sleep(config.WORK_POLL_INTERVAL)
+                continue
+
+            try:
+                with metrics.stage(f"task_{task.kind}"):
+                    handlers[task.kind](task)
+                self.queue.ack(task)
+                done += 1
+                metrics.incr(f"tasks_{task.kind}_done")
+            except Exception as e:
+                print(f"[!] [Worker] 任务 {task.id} 第 {task.attempts} 次执行失败: {e}")
+                self.queue.fail(task, e)
+                metrics.incr("tasks_failed")
+
+        print(f"[√] [Worker {self.worker_id}] 队列已清空，本 worker 完成 {done} 个任务")
+        return done
+
+
+def export_results(queue=None):
+    """汇总所有 worker 的解析结果并导出 Excel。"""
+    queue = queue or open_queue()
+    stats = queue.stats()
+    print(f"[*] [Queue] 任务状态: {stats}")
+    for dead in queue.dead_tasks():
+        print(f"    [!] 放弃的任务 {dead['id']}: {dead['error']}")
+    if queue.active():
+        print(f"[!] [Queue] 仍有 {queue.active()} 个任务未完成，导出结果可能不完整")
+
+    if config.HTTP_CACHE:
+        from http_cache import HttpCache
+        HttpCache().report()
+
+    from processor import DataProcessor
+    parsed = RawStore(config.PARSED_DATA_DIR)
+    rows = [row for page_rows in parsed.iter_pages() for row in page_rows]
+    print(f"[*] [Queue] 汇总 {len(parsed)} 页解析结果，共 {len(rows)} 条")
+    return DataProcessor().export(rows)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+import config
+import metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b"RAWS1"
+SEGMENT_FILE = "pages.seg"
+INDEX_FILE = "pages.idx"
+LOCK_FILE = "pages.lock"
+_LEN = struct.Struct(">I")
+
+
+class RawStore:
+    """原始分页数据存储: 单个追加写的段文件 + JSONL 索引。
+
+    段文件: MAGIC + 编码标记 (2 字节: 压缩 z=zstd/d=zlib, 序列化 m=msgpack/j=json)，之后每条记录为
+    4 字节长度前缀 + 压缩后的序列化数据。索引每行记录页号、来源 URL、内容哈希、偏移与长度，支持按页随机读取。
+
+    多个进程 (含共享存储上的多个节点) 可同时写入同一目录: 写入时持有文件锁并增量读取其他进程追加的索引；
+    append 传入 key 时按 key 幂等，重试的任务不会重复写入。
+    """
+
+    def __init__(self, root=None):
+        self.root = root or config.RAW_DATA_DIR
+        self.segment_path = os.path.join(self.root, SEGMENT_FILE)
+        self.index_path = os.path.join(self.root, INDEX_FILE)
+        self.lock_path = os.path.join(self.root, LOCK_FILE)
+        self._lock = threading.RLock()
+        self._index = None
+        self._index_pos = 0
+        self._keys = {}
+        self._codec = None
+
+    @contextmanager
+    def _file_lock(self):
+        # 跨进程互斥 (无 fcntl 的平台上仅有进程内的线程锁)
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.lock_path, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---------- 编解码 ----------
+    def _default_codec(self):
+        return (b"z" if zstandard else b"d") + (b"m" if msgpack else b"j")
+
+    def _encode(self, data):
+        raw = msgpack.packb(data, use_bin_type=True) if self._codec[1:] == b"m" else \
+            json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if self._codec[:1] == b"z":
+            payload = zstandard.ZstdCompressor(level=config.RAW_STORE_ZSTD_LEVEL).compress(raw)
+        else:
+            payload = zlib.compress(raw, 6)
+        return raw, payload
+
+    def _decode(self, payload):
+        if self._codec[:1] == b"z":
+            if zstandard is None: raise RuntimeError("段文件使用 zstd 压缩，需要安装 zstandard")
+            raw = zstandard.ZstdDecompressor().decompress(payload)
+        else:
+            raw = zlib.decompress(payload)
+        if self._codec[1:] == b"m":
+            if msgpack is None: raise RuntimeError("段文件使用 msgpack 编码，需要安装 msgpack")
+            return msgpack.unpackb(raw, raw=False)
+        return json.loads(raw)
+
+    def _read_header(self, f):
+        header = f.read(len(MAGIC) + 2)
+        if header[:len(MAGIC)] != MAGIC: raise ValueError(f"无效的段文件: {self.segment_path}")
+        self._codec = header[len(MAGIC):]
+
+    # ---------- 索引 ----------
+    def _refresh_index(self):
+        """增量读取索引文件中新追加的行 (其他进程写入的页)；文件被截断时重新加载。"""
+        if self._index is None or not os.path.exists(self.index_path) or \
+                os.path.getsize(self.index_path) < self._index_pos:
+            self._index, self._index_pos, self._keys = [], 0, {}
+        if not os.path.exists(self.index_path): return self._index
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_pos)
+            for line in f:
+                if not line.endswith(b"\n"): break
+                self._index_pos += len(line)
+                if not line.strip(): continue
+                entry = json.loads(line)
+                self._index.append(entry)
+                if entry.get("key") is not None: self._keys[entry["key"]] = entry["page"]
+        return self._index
+
+    def index(self):
+        if self._index is None:
+            with self._file_lock():
+                self._refresh_index()
+        return self._index
+
+    def __len__(self):
+        return len(self.index())
+
+    # ---------- 写入 ----------
+    def reset(self):
+        """清空存储 (截断段文件与索引)，替代逐个删除分页文件。"""
+        with self._file_lock():
+            self._truncate()
+
+    def _truncate(self):
+        os.makedirs(self.root, exist_ok=True)
+        self._codec = self._default_codec()
+        with open(self.segment_path, 'wb') as f:
+            f.write(MAGIC + self._codec)
+        open(self.index_path, 'w').close()
+        self._index, self._index_pos, self._keys = [], 0, {}
+
+    def append(self, data, source_url=None, key=None, shard=None):
+        """追加一页数据，返回页号 (从 1 开始)。key 已存在时不再写入，直接返回已有页号。shard 为所属分片的标签。"""
+        with self._file_lock():
+            if not os.path.exists(self.segment_path):
+                self._truncate()
+            index = self._refresh_index()
+            if key is not None and key in self._keys:
+                return self._keys[key]
+            if self._codec is None:
+                with open(self.segment_path, 'rb') as f:
+                    self._read_header(f)
+
+            raw, payload = self._encode(data)
+            with open(self.segment_path, 'ab') as f:
+                offset = f.tell()
+                f.write(_LEN.pack(len(payload)))
+                f.write(payload)
+
+            entry = {"page": len(index) + 1, "url": source_url, "hash": hashlib.sha1(raw).hexdigest(),
+                     "offset": offset, "length": len(payload), "size": len(raw)}
+            if key is not None: entry["key"] = key
+            if shard is not None: entry["shard"] = shard
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+            with open(self.index_path, 'ab') as f:
+                f.write(line)
+            index.append(entry)
+            self._index_pos += len(line)
+            if key is not None: self._keys[key] = entry["page"]
+
+        metrics.incr("bytes_written", _LEN.size + len(payload))
+        return entry["page"]
+
+    # ---------- 读取 ----------
+    def get(self, page):
+        """按页号随机读取。"""
+        if page > len(self.index()):
+            # 可能是其他进程刚写入的页
+            with self._file_lock():
+                self._refresh_index()
+        entry = self.index()[page - 1]
+        with open(self.segment_path, 'rb') as f:
+            self._read_header(f)
+            f.seek(entry["offset"] + _LEN.size)
+            payload = f.read(entry["length"])
+        metrics.incr("bytes_read", len(payload))
+        return self._decode(payload)
+
+    def find(self, key):
+        """按 append 时传入的 key 读取，不存在时返回 None。"""
+        self.index()
+        if key not in self._keys:
+            with self._file_lock():
+                self._refresh_index()
+        page = self._keys.get(key)
+        return self.get(page) if page else None
+
+    def iter_records(self):
+        """顺序流式读取，逐条返回 (索引项, 数据)。"""
+        index = self.index()
+        if not index: return
+        with open(self.segment_path, 'rb') as f:
+            self._read_header(f)
+            for entry in index:
+                f.seek(entry["offset"])
+                (length,) = _LEN.unpack(f.read(_LEN.size))
+                payload = f.read(length)
+                metrics.incr("bytes_read", _LEN.size + length)
+                yield entry, self._decode(payload)
+
+    def iter_pages(self):
+        for _, data in self.iter_records():
+            yield data
+
+    def largest_page(self):
+        """按未压缩体积返回最大的一页 (无需重新序列化比较)。"""
+        index = self.index()
+        if not index: return None
+        return self.get(max(index, key=lambda e: e["size"])["page"])
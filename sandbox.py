@@ -0,0 +1,226 @@
+import atexit
+import multiprocessing as mp
+import queue
+import threading
+import time
+import config
+
+try:
+    import resource  # 仅 POSIX 可用，Windows 下退化为只做墙钟超时控制
+except ImportError:
+    resource = None
+
+
+class SandboxError(Exception):
+    pass
+
+
+def _set_limits(cpu_seconds, memory_mb):
+    if resource is None: return
+    if cpu_seconds:
+        # RLIMIT_CPU 是进程累计值，需要在当前已用 CPU 基础上加额度
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY: soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    if memory_mb:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = memory_mb * 1024 * 1024
+        if hard != resource.RLIM_INFINITY: soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _reset_limits():
+    if resource is None: return
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (hard, hard))
+
+
+def _worker_main(conn, http_cache_dir=None):
+    # 预热: 生成代码常用的依赖只在进程启动时导入一次
+    import json
+    import re
+    import requests
+    if http_cache_dir:
+        # 生成代码中新建的 requests.Session 自动走条件请求缓存
+        import http_cache
+        http_cache.install(http_cache_dir)
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None: break
+
+        code, func_name, args_list, cpu_seconds, memory_mb, stream = task
+        try:
+            _set_limits(cpu_seconds, memory_mb)
+            scope = {"__name__": "__sandbox__", "json": json, "re": re, "requests": requests}
+            exec(code, scope)
+            func = scope.get(func_name)
+            if not callable(func):
+                raise ValueError(f"生成的代码中未找到 {func_name} 函数")
+
+            if stream:
+                # 流式: 函数返回的可迭代对象 (通常是生成器) 每产出一项立即回传
+                for item in func(*args_list[0]):
+                    conn.send(("item", item))
+                reply = ("done", None)
+            else:
+                results = []
+                for args in args_list:
+                    try:
+                        results.append(("ok", func(*args)))
+                    except Exception as e:
+                        results.append(("error", f"{type(e).__name__}: {e}"))
+                reply = ("ok", results)
+        except BaseException as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        finally:
+            _reset_limits()
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(("error", f"结果无法回传: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx, http_cache_dir=None):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, http_cache_dir), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+
+
+def _mp_context():
+    # fork 会把父进程的线程、锁和已打开的连接一并复制进 worker，优先 forkserver，不支持时退回 spawn
+    try:
+        return mp.get_context("forkserver")
+    except ValueError:
+        return mp.get_context("spawn")
+
+
+class SandboxPool:
+    """预热的子进程池，在 CPU / 内存 / 墙钟限制下执行 LLM 生成的代码，结果经管道回传。"""
+
+    def __init__(self, size=None, cpu_seconds=None, memory_mb=None, wall_seconds=None, http_cache_dir=None):
+        self.size = size or config.SANDBOX_WORKERS
+        self.cpu_seconds = cpu_seconds if cpu_seconds is not None else config.SANDBOX_CPU_SECONDS
+        self.memory_mb = memory_mb if memory_mb is not None else config.SANDBOX_MEMORY_MB
+        self.wall_seconds = wall_seconds if wall_seconds is not None else config.SANDBOX_WALL_SECONDS
+        self.http_cache_dir = http_cache_dir
+
+        self._ctx = _mp_context()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        return _Worker(self._ctx, self.http_cache_dir)
+
+    def run(self, code, func_name, args_list, wall_seconds=None):
+        """在一个空闲 worker 中加载 code，并对 args_list 中每组参数调用 func_name。
+
+        返回 [(status, value), ...]，status 为 "ok" 或 "error"；加载失败、超时或进程被限额杀死时抛出 SandboxError。
+        """
+        if self._closed: raise SandboxError("沙箱池已关闭")
+        wall = wall_seconds or self.wall_seconds
+
+        worker = self._idle.get()
+        healthy = False
+        try:
+            worker.conn.send((code, func_name, list(args_list), self.cpu_seconds, self.memory_mb, False))
+            if not worker.conn.poll(wall):
+                raise SandboxError(f"执行超时 ({wall}s)，已终止 worker")
+            status, value = worker.conn.recv()
+            healthy = True
+        except (EOFError, OSError, BrokenPipeError):
+            raise SandboxError("worker 异常退出 (可能超出 CPU / 内存限额)")
+        finally:
+            if not healthy:
+                worker.kill()
+                worker = self._spawn()
+            self._idle.put(worker)
+
+        if status != "ok": raise SandboxError(value)
+        return value
+
+    def stream(self, code, func_name, *args, wall_seconds=None):
+        """流式执行: func_name(*args) 返回的每一项经管道到达后立即 yield。
+
+        调用方提前关闭生成器 (如已判定无需继续翻页) 时，正在执行的 worker 会被终止并补充。
+        """
+        if self._closed: raise SandboxError("沙箱池已关闭")
+        deadline = time.monotonic() + (wall_seconds or self.wall_seconds)
+
+        worker = self._idle.get()
+        healthy = False
+        try:
+            worker.conn.send((code, func_name, [args], self.cpu_seconds, self.memory_mb, True))
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    raise SandboxError(f"执行超时 ({wall_seconds or self.wall_seconds}s)，已终止 worker")
+                status, value = worker.conn.recv()
+                if status == "item":
+                    yield value
+                    continue
+                healthy = True
+                if status != "done": raise SandboxError(value)
+                return
+        except (EOFError, OSError, BrokenPipeError):
+            raise SandboxError("worker 异常退出 (可能超出 CPU / 内存限额)")
+        finally:
+            if not healthy:
+                worker.kill()
+                worker = self._spawn()
+            self._idle.put(worker)
+
+    def call(self, code, func_name, *args, wall_seconds=None):
+        status, value = self.run(code, func_name, [args], wall_seconds=wall_seconds)[0]
+        if status != "ok": raise SandboxError(value)
+        return value
+
+    def close(self):
+        with self._lock:
+            if self._closed: return
+            self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+            worker.process.join(timeout=2)
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(http_cache_dir=config.HTTP_CACHE_DIR if config.HTTP_CACHE else None)
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,170 @@
+import math
+import config
+
+TOTAL_KEYS = ['total', 'totalcount', 'total_count', 'totalresults', 'total_results', 'numfound', 'totalhits',
+              'total_hits', 'nbhits', 'totalproducts', 'total_products', 'productcount', 'resultcount']
+SIZE_KEYS = ['limit', 'count', 'pagesize', 'page_size', 'size', 'rows', 'per_page', 'sz', 'hitsperpage']
+FACET_KEYS = ['facet', 'filter', 'refinement', 'aggregation', 'attribute']
+VALUE_KEYS = ['value', 'id', 'key', 'code', 'slug', 'name', 'label']
+COUNT_KEYS = ['count', 'doc_count', 'hits', 'total', 'productcount', 'product_count', 'hitcount', 'hit_count']
+GROUP_NAME_KEYS = ['param', 'parameter', 'field', 'attribute', 'attributeid', 'id', 'key', 'name']
+GENERIC_LIST_KEYS = ['values', 'buckets', 'options', 'items', 'entries', 'terms']
+PRICE_MIN_KEYS = ['pmin', 'price_min', 'minprice', 'min_price', 'pricemin', 'price_from']
+PRICE_MAX_KEYS = ['pmax', 'price_max', 'maxprice', 'max_price', 'pricemax', 'price_to']
+# 单值属性 (一个商品只属于一个取值) 天然互斥，优先用于分片
+DISJOINT_HINTS = ['cat', 'cgid', 'department', 'gender', 'collection', 'type', 'brand']
+
+
+def _lower_get(d, keys):
+    # 忽略大小写，按 keys 的先后顺序取第一个存在的字段
+    lowered = {str(k).lower(): k for k in d}
+    for key in keys:
+        if key in lowered: return lowered[key], d[lowered[key]]
+    return None, None
+
+
+def shard_label(shard):
+    """分片参数的可读标签，写入原始存储用于区分各分片的页面。"""
+    return "&".join(f"{k}={v}" for k, v in shard.items()) if shard else None
+
+
+class ShardPlanner:
+    """将超出翻页上限的大类目拆成互不重叠的分片 (facet 取值 / 价格区间)，每片都能在上限内翻完。"""
+
+    def __init__(self, context, sample_data, max_pages=None):
+        self.params = dict(context.get('params', {}))
+        self.data = sample_data
+        self.max_pages = max_pages or config.SCRAPER_MAX_PAGES
+
+        _, size = _lower_get(self.params, SIZE_KEYS)
+        self.page_size = int(size) if str(size).isdigit() and int(size) > 0 else 20
+        self.cap = self.max_pages * self.page_size
+
+    def _walk(self):
+        stack = [(self.data, None)]
+        while stack:
+            obj, parent_key = stack.pop()
+            yield obj, parent_key
+            if isinstance(obj, dict):
+                stack.extend((v, k) for k, v in obj.items() if isinstance(v, (dict, list)))
+            elif isinstance(obj, list):
+                stack.extend((v, parent_key) for v in obj if isinstance(v, (dict, list)))
+
+    def find_total(self):
+        best = 0
+        for obj, _ in self._walk():
+            if not isinstance(obj, dict): continue
+            for k, v in obj.items():
+                if str(k).lower() in TOTAL_KEYS and isinstance(v, int) and not isinstance(v, bool):
+                    best = max(best, v)
+        return best
+
+    def narrows(self, shard_page):
+        """分片首页报告的商品总数应小于全量；不变说明服务端忽略了分片参数。首页没有总数字段时无法判断，视为有效。"""
+        shard_total = ShardPlanner({'params': self.params}, shard_page, self.max_pages).find_total()
+        return not shard_total or shard_total < self.find_total()
+
+    def _facet_values(self, items):
+        values = []
+        for it in items:
+            if not isinstance(it, dict): return []
+            _, value = _lower_get(it, VALUE_KEYS)
+            _, count = _lower_get(it, COUNT_KEYS)
+            if not isinstance(value, (str, int)) or not isinstance(count, int): return []
+            values.append((str(value), count))
+        return values
+
+    def find_facets(self):
+        """在响应中寻找 [{value, count}, ...] 形式的 facet 列表，返回 [{"param", "values"}]。"""
+        facets = []
+        for obj, parent_key in self._walk():
+            if not isinstance(obj, dict): continue
+            for k, v in obj.items():
+                if not isinstance(v, list) or len(v) < 2: continue
+                values = self._facet_values(v)
+                if not values: continue
+
+                # facet 组名: 所在 dict 的 id/name 字段 > 列表键名 > 上一级键名 (如 aggregations.brand.buckets)
+                _, group = _lower_get(obj, GROUP_NAME_KEYS)
+                if isinstance(group, str):
+                    name = group
+                elif str(k).lower() not in GENERIC_LIST_KEYS:
+                    name = k
+                else:
+                    name = parent_key
+                if not name: continue
+                in_facet_block = any(f in str(parent_key).lower() or f in str(k).lower() for f in FACET_KEYS)
+                facets.append({"param": self._match_param(str(name)), "values": values, "hinted": in_facet_block})
+        return facets
+
+    def _match_param(self, name):
+        # 请求参数中已有同名 (忽略大小写) 参数时沿用其写法
+        for p in self.params:
+            if p.lower() == name.lower(): return p
+        return name
+
+    def _price_bounds(self):
+        min_key, min_val = _lower_get(self.params, PRICE_MIN_KEYS)
+        max_key, max_val = _lower_get(self.params, PRICE_MAX_KEYS)
+        if min_key and max_key:
+            try:
+                return min_key, max_key, float(min_val), float(max_val)
+            except (TypeError, ValueError):
+                pass
+        return None
+
+    def _price_shards(self, base, count):
+        bounds = self._price_bounds()
+        if not bounds: return None
+        min_key, max_key, lo, hi = bounds
+        # 留出余量: 价格分布不均匀，按 2 倍需要的片数切分
+        parts = max(2, math.ceil(count / self.cap) * 2)
+        step = (hi - lo) / parts
+        shards = []
+        for i in range(parts):
+            start = lo + i * step
+            end = hi if i == parts - 1 else lo + (i + 1) * step - 0.01
+            shards.append(dict(base, **{min_key: f"{start:.2f}", max_key: f"{end:.2f}"}))
+        return shards
+
+    def _score_facet(self, facet, total):
+        covered = sum(c for _, c in facet["values"])
+        disjoint = any(h in facet["param"].lower() for h in DISJOINT_HINTS)
+        oversize = sum(1 for _, c in facet["values"] if c > self.cap)
+        # 覆盖全量、互斥、超限取值少的 facet 优先
+        return (covered >= total * 0.95, disjoint, facet["hinted"], -oversize, -len(facet["values"]))
+
+    def plan(self):
+        """返回分片参数列表 (每项覆盖到初始参数上)；无需或无法分片时返回空列表。"""
+        total = self.find_total()
+        if total <= self.cap:
+            if total: print(f"[*] [Shard] 商品总数 {total} 未超过翻页上限 {self.cap}，无需分片")
+            return []
+
+        print(f"[*] [Shard] 商品总数 {total} 超过翻页上限 {self.cap} ({self.max_pages} 页 x {self.page_size})")
+        # 请求中已固定取值的参数 (如当前类目) 不能再用于分片
+        fixed = {p.lower() for p, v in self.params.items() if str(v).strip()}
+        facets = [f for f in self.find_facets() if f["param"].lower() not in fixed]
+        if facets:
+            best = max(facets, key=lambda f: self._score_facet(f, total))
+            shards = []
+            for value, count in best["values"]:
+                base = {best["param"]: value}
+                if count > self.cap:
+                    split = self._price_shards(base, count)
+                    if not split:
+                        print(f"[!] [Shard] {best['param']}={value} 有 {count} 件商品，超过翻页上限且无价格参数可再拆分，"
+                              f"该分片最多只能抓取 {self.cap} 件")
+                    shards.extend(split or [base])
+                else:
+                    shards.append(base)
+            print(f"[*] [Shard] 按 facet [{best['param']}] 拆分为 {len(shards)} 个分片")
+            return shards
+
+        shards = self._price_shards({}, total)
+        if shards:
+            print(f"[*] [Shard] 按价格区间拆分为 {len(shards)} 个分片")
+            return shards
+
+        print("[!] [Shard] 未找到可用于分片的 facet / 价格参数，退化为单次翻页")
+        return []
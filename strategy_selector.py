@@ -1,8 +1,8 @@
 import json
 import re
 import config
+import metrics
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 import os
 
 class StrategySelector:
@@ -11,6 +11,10 @@ class StrategySelector:
         self.main_domain = None
 
     def load_har(self):
+        with metrics.stage("har_load"):
+            return self._load_har()
+
+    def _load_har(self):
         all_entries = []
         target_dir = os.path.dirname(config.HAR_PATH)
         try:
@@ -21,6 +25,7 @@ class StrategySelector:
             for filename in har_files:
                 file_path = os.path.join(target_dir, filename)
                 print(f"[*] Loading: {filename}")
+                metrics.incr("bytes_read", os.path.getsize(file_path))
                 with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                     try:
                         data = json.load(f)
@@ -63,7 +68,9 @@ class StrategySelector:
         print(f"[*] Target Domain: [{self.main_domain}]")
 
         try:
-            soup = BeautifulSoup(main_entry['response']['content']['text'], 'html.parser')
+            from bs4 import BeautifulSoup
+            with metrics.stage("html_parse"):
+                soup = BeautifulSoup(main_entry['response']['content']['text'], 'html.parser')
             for tag in soup(['script', 'style', 'head']): tag.decompose()
             regex = re.compile(r'[\$€£¥]?\s?(\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?)')
             for node in soup.find_all(string=True):
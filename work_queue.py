@@ -0,0 +1,302 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class Task:
+    """一次租约: 任务 id、类型、参数、已尝试次数 (含本次) 与租约令牌。"""
+
+    def __init__(self, task_id, kind, payload, attempts, token):
+        self.id = task_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+        self.token = token
+
+    def __repr__(self):
+        return f"<Task {self.id} ({self.kind}) #{self.attempts}>"
+
+
+class SQLiteQueue:
+    """基于 SQLite 文件的任务队列，适用于单机多进程或共享卷上的少量节点。
+
+    任务状态: pending -> leased -> done / dead。租约过期的任务视为一次失败，重新排队；
+    尝试次数达到 max_attempts 后进入 dead。put 按 task_id 幂等。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_until REAL,
+        not_before REAL NOT NULL DEFAULT 0,
+        error TEXT,
+        created REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, kind, not_before);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    """
+
+    def __init__(self, path=None, max_attempts=None, lease_seconds=None):
+        self.path = path or config.WORK_QUEUE_DB
+        self.max_attempts = max_attempts or config.WORK_MAX_ATTEMPTS
+        self.lease_seconds = lease_seconds or config.WORK_LEASE_SECONDS
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        # BEGIN IMMEDIATE: 立即取得写锁，多个 worker 同时领取任务时不会拿到同一条
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def put(self, kind, payload, task_id=None):
+        """入队；task_id 已存在时忽略并返回 False。"""
+        task_id = task_id or uuid.uuid4().hex
+        cur = self._conn().execute(
+            "INSERT OR IGNORE INTO tasks (id, kind, payload, created) VALUES (?, ?, ?, ?)",
+            (task_id, kind, json.dumps(payload, ensure_ascii=False), time.time()))
+        return cur.rowcount > 0
+
+    def lease(self, kinds=None, lease_seconds=None):
+        """按 kinds 的顺序领取一个可执行的任务，没有时返回 None。"""
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._tx() as conn:
+            conn.execute("UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END, "
+                         "lease_owner = NULL, error = '租约过期' WHERE state = 'leased' AND lease_until < ?",
+                         (self.max_attempts, now))
+            for kind in kinds or [None]:
+                sql = "SELECT id, kind, payload, attempts FROM tasks WHERE state = 'pending' AND not_before <= ?"
+                args = [now]
+                if kind:
+                    sql += " AND kind = ?"
+                    args.append(kind)
+                row = conn.execute(sql + " ORDER BY not_before, created LIMIT 1", args).fetchone()
+                if row is None: continue
+                conn.execute("UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                             "lease_until = ? WHERE id = ?",
+                             (token, now + (lease_seconds or self.lease_seconds), row[0]))
+                return Task(row[0], row[1], json.loads(row[2]), row[3] + 1, token)
+        return None
+
+    def renew(self, task, lease_seconds=None):
+        """续约；租约已被收回 (超时后被其他 worker 领取) 时返回 False。"""
+        cur = self._conn().execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND lease_owner = ? AND state = 'leased'",
+                                   (time.time() + (lease_seconds or self.lease_seconds), task.id, task.token))
+        return cur.rowcount > 0
+
+    def ack(self, task):
+        self._conn().execute("UPDATE tasks SET state = 'done', lease_owner = NULL, error = NULL "
+                             "WHERE id = ? AND lease_owner = ?", (task.id, task.token))
+
+    def fail(self, task, error=None):
+        """失败后按尝试次数退避重排队，超过 max_attempts 进入 dead。"""
+        dead = task.attempts >= self.max_attempts
+        self._conn().execute(
+            "UPDATE tasks SET state = ?, lease_owner = NULL, not_before = ?, error = ? WHERE id = ? AND lease_owner = ?",
+            ('dead' if dead else 'pending', time.time() + config.WORK_RETRY_DELAY * task.attempts,
+             str(error)[:2000] if error else None, task.id, task.token))
+
+    def stats(self):
+        rows = self._conn().execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        return dict(rows)
+
+    def active(self):
+        """待执行与租约中的任务数；为 0 表示队列已清空。"""
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()
+        return count
+
+    def dead_tasks(self):
+        rows = self._conn().execute("SELECT id, error FROM tasks WHERE state = 'dead'").fetchall()
+        return [{"id": task_id, "error": error} for task_id, error in rows]
+
+    def set_meta(self, key, value):
+        self._conn().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             (key, json.dumps(value, ensure_ascii=False)))
+
+    def get_meta(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def clear(self):
+        with self._tx() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM meta")
+
+
+class RedisQueue:
+    """Redis 任务队列，供多节点共享。client 可传入任何兼容 redis-py 接口的对象 (如本地替身)。
+
+    键布局 (prefix 下): tasks (hash: id -> 任务记录), pending:<kind> (zset: 可执行时间),
+    leased (zset: 租约到期时间), kinds (set), meta (hash)。领取通过 MULTI 中的 ZREM 抢占，
+    语义为至少一次 (at-least-once)，重复执行由幂等写入吸收。
+    """
+
+    def __init__(self, client=None, url=None, prefix="crawler:", max_attempts=None, lease_seconds=None):
+        if client is None:
+            if redis is None: raise RuntimeError("使用 Redis 队列需要安装 redis")
+            client = redis.Redis.from_url(url or config.WORK_QUEUE_URL)
+        self.client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts or config.WORK_MAX_ATTEMPTS
+        self.lease_seconds = lease_seconds or config.WORK_LEASE_SECONDS
+
+    def _key(self, name):
+        return f"{self.prefix}{name}"
+
+    @staticmethod
+    def _str(value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def _record(self, task_id):
+        raw = self.client.hget(self._key("tasks"), task_id)
+        return json.loads(self._str(raw)) if raw else None
+
+    def _save(self, task_id, record):
+        self.client.hset(self._key("tasks"), task_id, json.dumps(record, ensure_ascii=False))
+
+    def put(self, kind, payload, task_id=None):
+        task_id = task_id or uuid.uuid4().hex
+        record = {"kind": kind, "payload": payload, "state": "pending", "attempts": 0, "owner": None, "error": None}
+        if not self.client.hsetnx(self._key("tasks"), task_id, json.dumps(record, ensure_ascii=False)):
+            return False
+        self.client.sadd(self._key("kinds"), kind)
+        self.client.zadd(self._key(f"pending:{kind}"), {task_id: time.time()})
+        return True
+
+    def _kinds(self):
+        return sorted(self._str(k) for k in self.client.smembers(self._key("kinds")))
+
+    def _reclaim(self, now):
+        # 过期租约放回 pending (NX: 已被其他 worker 放回时不重复)，尝试次数在领取时检查
+        for raw_id in self.client.zrangebyscore(self._key("leased"), 0, now):
+            task_id = self._str(raw_id)
+            record = self._record(task_id)
+            if record is None: continue
+            pipe = self.client.pipeline(transaction=True)
+            pipe.zrem(self._key("leased"), task_id)
+            pipe.zadd(self._key(f"pending:{record['kind']}"), {task_id: now}, nx=True)
+            pipe.execute()
+
+    def lease(self, kinds=None, lease_seconds=None):
+        now = time.time()
+        self._reclaim(now)
+        deadline = now + (lease_seconds or self.lease_seconds)
+        for kind in kinds or self._kinds():
+            for raw_id in self.client.zrangebyscore(self._key(f"pending:{kind}"), 0, now, start=0, num=10):
+                task_id = self._str(raw_id)
+                pipe = self.client.pipeline(transaction=True)
+                pipe.zrem(self._key(f"pending:{kind}"), task_id)
+                pipe.zadd(self._key("leased"), {task_id: deadline}, nx=True)
+                removed, _ = pipe.execute()
+                if not removed: continue  # 被其他 worker 抢先领取
+
+                record = self._record(task_id)
+                if record is None or record["state"] in ("done", "dead"):
+                    self.client.zrem(self._key("leased"), task_id)
+                    continue
+                if record["attempts"] >= self.max_attempts:
+                    self.client.zrem(self._key("leased"), task_id)
+                    record.update(state="dead", owner=None, error=record.get("error") or "租约过期")
+                    self._save(task_id, record)
+                    continue
+
+                token = uuid.uuid4().hex
+                record.update(state="leased", attempts=record["attempts"] + 1, owner=token)
+                self._save(task_id, record)
+                return Task(task_id, kind, record["payload"], record["attempts"], token)
+        return None
+
+    def _owned(self, task):
+        record = self._record(task.id)
+        return record if record and record.get("owner") == task.token else None
+
+    def renew(self, task, lease_seconds=None):
+        if not self._owned(task): return False
+        return bool(self.client.zadd(self._key("leased"), {task.id: time.time() + (lease_seconds or self.lease_seconds)},
+                                     xx=True, ch=True))
+
+    def ack(self, task):
+        record = self._owned(task)
+        if not record: return
+        record.update(state="done", owner=None, error=None)
+        self._save(task.id, record)
+        self.client.zrem(self._key("leased"), task.id)
+
+    def fail(self, task, error=None):
+        record = self._owned(task)
+        if not record: return
+        dead = task.attempts >= self.max_attempts
+        record.update(state="dead" if dead else "pending", owner=None, error=str(error)[:2000] if error else None)
+        self._save(task.id, record)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zrem(self._key("leased"), task.id)
+        if not dead:
+            pipe.zadd(self._key(f"pending:{task.kind}"), {task.id: time.time() + config.WORK_RETRY_DELAY * task.attempts})
+        pipe.execute()
+
+    def _records(self):
+        for task_id, raw in self.client.hgetall(self._key("tasks")).items():
+            yield self._str(task_id), json.loads(self._str(raw))
+
+    def stats(self):
+        counts = {}
+        for _, record in self._records():
+            counts[record["state"]] = counts.get(record["state"], 0) + 1
+        return counts
+
+    def active(self):
+        return sum(self.client.zcard(self._key(f"pending:{k}")) for k in self._kinds()) + \
+            self.client.zcard(self._key("leased"))
+
+    def dead_tasks(self):
+        return [{"id": task_id, "error": r.get("error")} for task_id, r in self._records() if r["state"] == "dead"]
+
+    def set_meta(self, key, value):
+        self.client.hset(self._key("meta"), key, json.dumps(value, ensure_ascii=False))
+
+    def get_meta(self, key, default=None):
+        raw = self.client.hget(self._key("meta"), key)
+        return json.loads(self._str(raw)) if raw else default
+
+    def clear(self):
+        keys = [self._key(n) for n in ("tasks", "leased", "kinds", "meta")]
+        keys += [self._key(f"pending:{k}") for k in self._kinds()]
+        self.client.delete(*keys)
+
+
+def open_queue(url=None):
+    """按 WORK_QUEUE_URL 选择后端: redis:// / rediss:// 为 Redis，sqlite:///<path> 或空值为 SQLite 文件。"""
+    url = config.WORK_QUEUE_URL if url is None else url
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueue(url=url, prefix=f"crawler:{config.PROJECT_NAME}:")
+    path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else None
+    return SQLiteQueue(path)